@@ -0,0 +1,208 @@
+# backend/agents/batch_runner.py
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ✅ Ensure backend package is importable
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.logger import log_event
+from backend.tools.llm_tool import track_usage
+
+
+def _invalid_item(item):
+    """Why an input line cannot be run, or None if it is a valid item."""
+    if not isinstance(item, dict):
+        return "item must be a JSON object"
+    if not isinstance(item.get("message"), str) or not item["message"].strip():
+        return "'message' is required and must be a non-empty string"
+    if item.get("patient_name") is not None and not isinstance(item["patient_name"], str):
+        return "'patient_name' must be a string"
+    return None
+
+
+def load_items(input_path: str):
+    """
+    Yield {'id', 'patient_name', 'message', ...} items from a JSONL file; ids default to line numbers.
+    Malformed lines are yielded as {'id', 'invalid': reason} so they become error rows instead of aborting the batch.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": str(lineno), "invalid": f"invalid JSON: {e.msg}"}
+                continue
+            reason = _invalid_item(item)
+            if reason:
+                item_id = item.get("id", lineno) if isinstance(item, dict) else lineno
+                yield {"id": str(item_id), "invalid": reason}
+                continue
+            item["id"] = str(item.get("id", lineno))
+            yield item
+
+
+def truncate_partial_line(output_path: str):
+    """
+    Cut a torn last line left by a crash, so the rows a resumed run appends start
+    on a line of their own instead of being glued onto the fragment.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            f.seek(pos - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids already written by a previous (possibly interrupted) run."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (json.JSONDecodeError, KeyError):
+                continue  # torn last line from a crash: the item is simply re-run
+    return done
+
+
+def run_item(item: dict, route_fn) -> dict:
+    """
+    Route one message and measure latency and LLM token usage. Failures the agents
+    swallowed into fallback text (LLM/retrieval/web errors) still mark the row as an error.
+    """
+    start = time.perf_counter()
+    with track_usage() as usage:
+        route, response, error = None, None, item.get("invalid")
+        if error is None:
+            try:
+                route, response = route_fn(item["message"])
+            except Exception as e:
+                error = str(e)
+        if error is None and usage["errors"]:
+            error = "; ".join(usage["errors"])
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    result = {
+        "id": item["id"],
+        "patient_name": item.get("patient_name"),
+        "message": item.get("message"),
+        "route": route,
+        "response": response if isinstance(response, str) else json.dumps(response),
+        "latency_ms": round(latency_ms, 2),
+        "llm_calls": usage["calls"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "error": error,
+    }
+    if "expected_route" in item:
+        result["expected_route"] = item["expected_route"]
+        result["route_ok"] = route == item["expected_route"]
+    return result
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = 8, offline: bool = False) -> dict:
+    """
+    Replay logged patient messages through intent detection and the agents.
+
+    At most `concurrency` items run at once and a small window is queued, so
+    memory does not grow with the input. Results are appended to `output_path`
+    as they complete; re-running with the same output resumes where it stopped.
+    """
+    if offline:
+        # Must be set before the agents import their LLM clients
+        os.environ["LLM_BACKEND"] = "stub"
+
+    from backend.agents.orchestrator import route_message
+
+    if offline:
+        def route_fn(message):
+            return route_message(message, web_search=lambda q: "[stub web search]")
+    else:
+        route_fn = route_message
+
+    truncate_partial_line(output_path)
+    done = completed_ids(output_path)
+    pending = (item for item in load_items(input_path) if item["id"] not in done)
+    log_event("BatchRunner", f"Starting batch: {len(done)} items already done, concurrency={concurrency}")
+
+    routes, latencies = Counter(), []
+    processed = errors = route_checked = route_correct = 0
+    prompt_tokens = completion_tokens = 0
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(concurrency) as pool:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency * 2:
+                item = next(pending, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    in_flight.add(pool.submit(run_item, item, route_fn))
+
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+                processed += 1
+                routes[result["route"]] += 1
+                latencies.append(result["latency_ms"])
+                prompt_tokens += result["prompt_tokens"]
+                completion_tokens += result["completion_tokens"]
+                errors += result["error"] is not None
+                if "route_ok" in result:
+                    route_checked += 1
+                    route_correct += result["route_ok"]
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "processed": processed,
+        "skipped_already_done": len(done),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "items_per_sec": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "routes": dict(routes),
+        "route_accuracy": round(route_correct / route_checked, 4) if route_checked else None,
+        "latency_ms_p50": round(statistics.median(latencies), 2) if latencies else None,
+        "latency_ms_p95": round(statistics.quantiles(latencies, n=20)[-1], 2) if len(latencies) > 1 else None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }
+    log_event("BatchRunner", f"Batch finished: {processed} items in {summary['seconds']}s ({summary['items_per_sec']}/s)")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay patient messages through the orchestrator in batch")
+    parser.add_argument("input", help="JSONL with patient_name, message (optional id, expected_route)")
+    parser.add_argument("output", help="JSONL results file (appended to; enables resume)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--offline", action="store_true", help="Use the stub LLM and skip live web search")
+    args = parser.parse_args()
+
+    print(json.dumps(run_batch(args.input, args.output, args.concurrency, args.offline), indent=2))
@@ -1,25 +1,24 @@
 import os
 from loguru import logger
-from huggingface_hub import InferenceClient
 from backend.tools.rag_tool import RAGTool
+from backend.tools.llm_tool import get_llm_client, llm_backend, record_failure
 from backend.utils.patient_db import get_patient_data
 
 # ----------------------------
 # 🔑 API Setup
 # ----------------------------
 HF_API_KEY = os.getenv("HF_TOKEN", "")
-if not HF_API_KEY:
+if not HF_API_KEY and llm_backend() == "hf":
     raise ValueError("❌ HF_TOKEN not found in environment. Please set it before running.")
 
 # ----------------------------
 # ⚙️ Initialize Components
 # ----------------------------
-rag = RAGTool()
+# With RAG_RETRIEVAL_SOCKET set, every uvicorn worker shares one retrieval sidecar
+# (python -m backend.tools.retrieval_server) instead of loading its own model/index.
+rag = RAGTool(retrieval_socket=os.getenv("RAG_RETRIEVAL_SOCKET"))
 
-client = InferenceClient(
-    model="mistralai/Mistral-7B-Instruct-v0.2",
-    token=HF_API_KEY
-)
+client = get_llm_client(token=HF_API_KEY)
 
 # ----------------------------
 # 🧠 Main Logic
@@ -91,4 +90,5 @@ def generate_medical_response(query: str, patient_name: str = None):
 
     except Exception as e:
         logger.error(f"❌ Clinical agent error: {e}")
+        record_failure(f"Clinical agent error: {e}")
         return "I'm sorry, I encountered an issue while processing your medical query."
@@ -0,0 +1,17 @@
+import re
+
+# Single intent classifier for every entry point (/chat, orchestrator CLI, batch runner),
+# so offline routing checks exercise exactly what production uses.
+MEDICAL_KEYWORDS = [
+    "pain", "fever", "urine", "kidney", "infection", "treatment",
+    "edema", "medicine", "dose", "symptom", "disease"
+]
+
+
+def detect_intent(user_input: str) -> str:
+    """Classify a message as 'medical', 'web' or 'general'."""
+    if "research" in user_input.lower() or "latest" in user_input.lower():
+        return "web"
+    if any(re.search(rf"\b{kw}\b", user_input.lower()) for kw in MEDICAL_KEYWORDS):
+        return "medical"
+    return "general"
@@ -1,66 +1,32 @@
 import sys
 import os
-import re
 
 # ✅ Ensure backend package is importable
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 from backend.agents.receptionist_agent import receptionist_response
 from backend.agents.clinical_agent import generate_medical_response
+from backend.agents.intent import detect_intent
 from backend.utils.web_search import perform_web_search
 from backend.utils.logger import log_event
 
 
-# 🔍 Intent detection
-import re
-
-def detect_intent(user_input: str) -> str:
+# 🔀 Non-interactive routing (used by the batch runner)
+def route_message(user_input: str, web_search=perform_web_search):
     """
-    Detect if the user's input is medical, web/research, or general conversation.
-    Returns one of: 'medical', 'web', or 'general'
+    Detect intent and call the matching agent exactly as POST /chat does, so
+    prompts, token counts and answers match production. Returns (intent, response).
     """
+    intent = detect_intent(user_input)
 
-    text = user_input.lower().strip()
-
-    # -------------------------------
-    # 1️⃣ Web / Research / Information intent
-    # -------------------------------
-    web_keywords = [
-        "latest", "update", "research", "news", "recent", "current treatment",
-        "new treatment", "recent study", "findings", "breakthrough",
-        "paper", "publication", "guidelines", "discovery"
-    ]
-    if any(kw in text for kw in web_keywords):
-        return "web"
-
-    # -------------------------------
-    # 2️⃣ Medical / Symptom / Treatment intent
-    # -------------------------------
-    medical_patterns = [
-        r"\b(pain|ache|cramp|swelling|fever|cough|infection|vomit|nausea|edema)\b",
-        r"\b(kidney|urine|dialysis|bp|blood pressure|creatinine|urea|glucose)\b",
-        r"\b(medicine|tablet|drug|dose|mg|prescription|treatment|therapy)\b",
-        r"\b(symptom|diagnosis|disease|condition|disorder)\b",
-        r"\b(follow[- ]?up|appointment|check[- ]?up)\b",
-        r"\b(report|scan|test|result|x-ray|ultrasound|blood test)\b",
-        r"\b(shortness of breath|dizziness|fatigue|numbness|itching)\b"
-    ]
-    for pattern in medical_patterns:
-        if re.search(pattern, text):
-            return "medical"
-
-    # -------------------------------
-    # 3️⃣ Contextual cues (sentence structure / tone)
-    # -------------------------------
-    if re.search(r"(should i|can i|do i need|is it okay if)", text):
-        # Often implies a health-related question
-        return "medical"
-
-    # -------------------------------
-    # 4️⃣ Default fallback: general / small talk
-    # -------------------------------
-    return "general"
+    if intent == "medical":
+        response = generate_medical_response(user_input)
+    elif intent == "web":
+        response = web_search(user_input)
+    else:
+        response = receptionist_response(user_input)
 
+    return intent, response
 
 
 # 🧩 Orchestrator
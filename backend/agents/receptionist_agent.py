@@ -1,14 +1,14 @@
 import os
 import sys
-from huggingface_hub import InferenceClient
 
 # ensure backend folder is in path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from backend.utils.patient_db import get_patient_data
 from backend.utils.logger import log_event
+from backend.tools.llm_tool import get_llm_client
 
-client = InferenceClient(model="mistralai/Mistral-7B-Instruct-v0.2")
+client = get_llm_client()
 
 
 def call_mistral(prompt: str) -> str:
@@ -1,15 +1,24 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import sys, os, re
+import sys, os, secrets
 from fastapi.middleware.cors import CORSMiddleware
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from backend.agents.receptionist_agent import receptionist_response
-from backend.agents.clinical_agent import generate_medical_response
+from backend.agents.clinical_agent import generate_medical_response, rag
+from backend.agents.intent import detect_intent
+from backend.tools import kb_manager
 from backend.utils.web_search import perform_web_search
 from backend.utils.logger import log_event
-from backend.utils.patient_db import get_patient_data
+from backend.utils.patient_db import get_patient_data, find_patient_candidates, record_version
+from backend.utils.bulk_io import NDJSONImporter, export_ndjson, DEFAULT_BATCH_SIZE
+from backend.utils.admission import AdmissionController, AdmissionRejected
+from backend.utils.response_shaping import (
+    ChatReply, add_compression, etag_matches, make_etag, select_fields
+)
 
 app = FastAPI(title="Post-Discharge AI Assistant", version="2.1")
 
@@ -20,47 +29,78 @@ app.add_middleware(
     allow_methods=["*"],  # allow POST, OPTIONS etc.
     allow_headers=["*"],
 )
+# Large responses (long agent answers, NDJSON export) go out gzip/br-compressed
+add_compression(app)
+
+# -------------------------
+# Admission Control (LLM-bound requests)
+# -------------------------
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+    max_queued_per_patient=int(os.getenv("ADMISSION_MAX_PER_PATIENT", "4")),
+)
+# -------------------------
+# Admin Auth (bulk patient data, KB management)
+# -------------------------
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set and sent as X-Admin-Token."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or not secrets.compare_digest(x_admin_token or "", expected):
+        raise HTTPException(status_code=403, detail="Admin access denied")
+
 # -------------------------
 # Input Schema
 # -------------------------
 class Query(BaseModel):
     patient_name: str | None = None
     message: str
+    # The client already has the record from GET /chat; e.g. "*" or "medications,follow_up" to get it back
+    patient_fields: str | None = None
 
-# -------------------------
-# Intent Detection
-# -------------------------
-def detect_intent(user_input: str) -> str:
-    medical_keywords = [
-        "pain", "fever", "urine", "kidney", "infection", "treatment",
-        "edema", "medicine", "dose", "symptom", "disease"
-    ]
-    if "research" in user_input.lower() or "latest" in user_input.lower():
-        return "web"
-    if any(re.search(rf"\b{kw}\b", user_input.lower()) for kw in medical_keywords):
-        return "medical"
-    return "general"
+class KBUpdate(BaseModel):
+    pdf_paths: list[str]
+
+class KBRollback(BaseModel):
+    version: str | None = None
 
 # -------------------------
 # GET Endpoint: Retrieve patient info by name
 # -------------------------
-@app.get("/chat")
-async def get_patient_info(name: str):
+@app.get("/chat", response_model=ChatReply, response_model_exclude_unset=True)
+async def get_patient_info(name: str, response: Response, fields: str | None = None,
+                           if_none_match: str | None = Header(default=None)):
     try:
         log_event("Reception", f"Retrieving patient info for: {name}")
         patient = get_patient_data(name)
 
         if not patient:
-            log_event("Reception", f"Unknown patient: {name}")
+            candidates = find_patient_candidates(name)
+            log_event("Reception", f"Unknown patient: {name} ({len(candidates)} candidates)")
+            if candidates:
+                suggestions = ", ".join(c["patient_name"] for c in candidates)
+                return {
+                    "role": "receptionist_agent",
+                    "response": f"❓ No exact record for '{name}'. Did you mean: {suggestions}?",
+                    "candidates": candidates
+                }
             return {
                 "role": "receptionist_agent",
-                "response": f"❌ Sorry, no records found for '{name}'. You may register first."
+                "response": f"❌ Sorry, no records found for '{name}'. You may register first.",
+                "candidates": []
             }
 
+        # Revalidate with If-None-Match: an unchanged record costs a bodiless 304
+        headers = {"ETag": make_etag(record_version(patient), fields), "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, headers["ETag"]):
+            log_event("Reception", f"Patient record unchanged for: {name}")
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
         return {
             "role": "receptionist_agent",
             "response": f"👋 Welcome back, {name}! How are you",
-            "patient": patient
+            "patient": select_fields(patient, fields)
         }
 
     except Exception as e:
@@ -70,7 +110,7 @@ async def get_patient_info(name: str):
 # -------------------------
 # POST Endpoint: Chat handler
 # -------------------------
-@app.post("/chat")
+@app.post("/chat", response_model=ChatReply, response_model_exclude_unset=True)
 async def chat(query: Query):
     try:
         log_event("System", f"Received: {query}")
@@ -97,34 +137,120 @@ async def chat(query: Query):
         log_event("Orchestrator", f"Detected intent: {intent}")
 
         # --- Step 4: Route to agents ---
-        if intent == "medical":
-            response = generate_medical_response(query.message)
-            return {
-                "role": "clinical_agent",
-                "response": f"🩺 Clinical Agent Response:\n{response}",
-                "patient": patient
-            }
+        # Agents block on the LLM, so they run in the threadpool behind an admission slot
+        async with admission.slot(intent, query.patient_name):
+            if intent == "medical":
+                response = await run_in_threadpool(generate_medical_response, query.message)
+                body = {
+                    "role": "clinical_agent",
+                    "response": f"🩺 Clinical Agent Response:\n{response}"
+                }
 
-        elif intent == "web":
-            result = perform_web_search(query.message)
-            return {
-                "role": "web_agent",
-                "response": f"🌐 Web Search Result:\n{result}",
-                "patient": patient
-            }
+            elif intent == "web":
+                result = await run_in_threadpool(perform_web_search, query.message)
+                body = {
+                    "role": "web_agent",
+                    "response": f"🌐 Web Search Result:\n{result}"
+                }
 
-        else:
-            response = receptionist_response(query.message)
-            return {
-                "role": "receptionist_agent",
-                "response": response,
-                "patient": patient
+            else:
+                response = await run_in_threadpool(receptionist_response, query.message)
+                body = {
+                    "role": "receptionist_agent",
+                    "response": response
+                }
+
+        # --- Step 5: Attach the patient record only if asked for ---
+        if query.patient_fields:
+            body["patient"] = select_fields(patient, query.patient_fields)
+        return body
+
+    except AdmissionRejected as e:
+        log_event("Admission", f"Rejected {query.patient_name}: {e.reason}")
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "role": "system",
+                "response": "⏳ The assistant is busy right now. Please try again shortly.",
+                "reason": e.reason
             }
+        )
 
     except Exception as e:
         log_event("Error", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------
+# Bulk Import / Export (NDJSON)
+# -------------------------
+@app.post("/patients/import", dependencies=[Depends(require_admin)])
+async def import_patients(request: Request, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Stream an NDJSON body into the patient DB, committing every `batch_size` records."""
+    try:
+        importer = NDJSONImporter(batch_size)
+        # Parsing and batch commits (file I/O + fsync) run off the event loop
+        async for chunk in request.stream():
+            await run_in_threadpool(importer.feed_bytes, chunk)
+        return await run_in_threadpool(importer.finish)
+
+    except Exception as e:
+        log_event("Error", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/patients/export", dependencies=[Depends(require_admin)])
+def export_patients(batch_size: int = DEFAULT_BATCH_SIZE):
+    """Stream the patient DB out as NDJSON."""
+    return StreamingResponse(export_ndjson(batch_size), media_type="application/x-ndjson")
+
+# -------------------------
+# Admin: Knowledge-base Versions
+# -------------------------
+# The same directory RAGTool watches, so an activated version is the one served
+KB_DIR = rag.kb_dir
+
+
+@app.get("/admin/kb", dependencies=[Depends(require_admin)])
+def kb_status():
+    return {
+        "kb_dir": KB_DIR,
+        "current": kb_manager.current_version(KB_DIR),
+        "serving": rag.kb_version,
+        "versions": kb_manager.list_versions(KB_DIR),
+    }
+
+
+@app.post("/admin/kb/documents", dependencies=[Depends(require_admin)])
+async def kb_add_documents(update: KBUpdate):
+    """Chunk and embed only the new PDFs into a new KB version and activate it."""
+    try:
+        log_event("Admin", f"KB update with {update.pdf_paths}")
+        # The first version starts from the static store and index this process serves
+        return await run_in_threadpool(kb_manager.add_documents, update.pdf_paths, KB_DIR, rag.encoder,
+                                       seed_chunks=rag.chunks_path, seed_index=rag.index_path)
+    except Exception as e:
+        log_event("Error", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/admin/kb/rollback", dependencies=[Depends(require_admin)])
+def kb_rollback(request: KBRollback):
+    try:
+        version = kb_manager.rollback(KB_DIR, request.version)
+        log_event("Admin", f"KB rolled back to {version}")
+        return {"current": version}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# -------------------------
+# Metrics
+# -------------------------
+@app.get("/metrics")
+def metrics():
+    """Admission queue depth, in-flight LLM calls and queue-wait percentiles."""
+    return {"admission": admission.metrics()}
+
 # -------------------------
 # Health Check
 # -------------------------
@@ -0,0 +1,92 @@
+# backend/tools/bench_encoders.py
+#
+# Compare embedding backends: init time, single-query and batched latency,
+# and cosine agreement with the PyTorch SentenceTransformer reference.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.tools.encoders import DEFAULT_MODEL, get_encoder
+from backend.utils.chunk_store import ChunkStore
+
+SAMPLE_QUERIES = [
+    "What are the management guidelines for CKD?",
+    "Is swelling in my ankles a warning sign after discharge?",
+    "How much fluid can I drink per day on dialysis?",
+    "Can I take ibuprofen with lisinopril?",
+    "What does a rising creatinine level mean?",
+]
+
+
+def _load_texts(chunks_path: str, n: int) -> list:
+    """First `n` chunks of a chunk store directory (or legacy JSON list), else repeated sample queries."""
+    if chunks_path and os.path.isdir(chunks_path):
+        store = ChunkStore(chunks_path)
+        return [store[i] for i in range(min(n, len(store)))]
+    if chunks_path and os.path.exists(chunks_path):
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            return json.load(f)[:n]
+    return (SAMPLE_QUERIES * (n // len(SAMPLE_QUERIES) + 1))[:n]
+
+
+def _bench(encoder, queries: list, texts: list, repeats: int, batch_size: int) -> dict:
+    encoder.encode(queries[:1])  # warm-up
+
+    single = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            encoder.encode([q])
+            single.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=batch_size)
+    batched = time.perf_counter() - start
+
+    return {
+        "single_p50_ms": statistics.median(single),
+        "single_p95_ms": statistics.quantiles(single, n=20)[-1],
+        "batched_texts_per_sec": len(texts) / batched,
+        "embeddings": embeddings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--chunks", default=None, help="Chunk store directory (or legacy chunk JSON) to use as the batched corpus")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = _load_texts(args.chunks, args.texts)
+    reference = None
+
+    print(f"{'backend':>10} {'init s':>7} {'1q p50 ms':>10} {'1q p95 ms':>10} {'batch txt/s':>12} {'cos mean':>9} {'cos min':>8}")
+    for backend in args.backends:
+        start = time.perf_counter()
+        encoder = get_encoder(backend, args.model)
+        init = time.perf_counter() - start
+
+        result = _bench(encoder, SAMPLE_QUERIES, texts, args.repeats, args.batch_size)
+        emb = result["embeddings"]
+        if reference is None:
+            reference = emb  # first backend (torch by default) is the reference
+        cos = np.sum(reference * emb, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(emb, axis=1))
+
+        print(f"{backend:>10} {init:>7.2f} {result['single_p50_ms']:>10.2f} {result['single_p95_ms']:>10.2f} "
+              f"{result['batched_texts_per_sec']:>12.1f} {cos.mean():>9.5f} {cos.min():>8.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/tools/bench_responses.py
+#
+# Bytes on the wire and serialization time per /chat response, before and
+# after response shaping (patient payload trimmed from POST /chat, 304s on
+# GET /chat revalidation, Pydantic response-model rendering, gzip/br compression).
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.patient_db import DB_PATH
+from backend.utils.response_shaping import COMPRESS_MIN_SIZE, ChatReply
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# A typical clinical agent answer (~1 KB), which dominates POST /chat bodies
+SAMPLE_ANSWER = (
+    "🩺 Clinical Agent Response:\n"
+    "Based on the nephrology reference, swelling in the ankles after discharge can indicate fluid "
+    "retention, which is common in chronic kidney disease. Keep to your fluid restriction, weigh yourself "
+    "every morning and contact your care team if your weight rises by more than 2 kg in three days. "
+    "Loop diuretics such as furosemide may need adjusting, so do not change your dose yourself. "
+    "Seek urgent care if you notice shortness of breath, chest pain or a sharp drop in urine output. "
+    "Reducing dietary sodium to under 2 g per day helps limit fluid retention, and elevating your legs "
+    "when sitting can ease swelling. Your follow-up appointment is the right time to review your "
+    "medications and recent lab results such as creatinine, potassium and eGFR.\n"
+    "Source: Comprehensive Clinical Nephrology (pages 912, 915)"
+)
+
+
+CHAT_REPLY = TypeAdapter(ChatReply)
+
+
+def stdlib_render(content) -> bytes:
+    """What FastAPI does for a plain dict: jsonable_encoder, then Starlette's JSONResponse settings."""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def model_render(content) -> bytes:
+    """What FastAPI does with response_model=ChatReply: validate, then dump JSON bytes in Pydantic's core."""
+    return CHAT_REPLY.dump_json(CHAT_REPLY.validate_python(content), exclude_unset=True)
+
+
+def _time_us(fn, content, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(content)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def _wire_sizes(body: bytes) -> dict:
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {"identity": len(body), "gzip": len(body), "br": len(body) if brotli else None}
+    return {
+        "identity": len(body),
+        "gzip": len(gzip.compress(body, compresslevel=9)),  # GZipMiddleware default level
+        "br": len(brotli.compress(body, quality=4)) if brotli else None,  # BrotliMiddleware default
+    }
+
+
+def bench(records: list, repeats: int) -> list:
+    record = max(records, key=lambda r: len(stdlib_render(r)))
+    name = record["patient_name"]
+    cases = [
+        ("GET /chat (before)", {"role": "receptionist_agent",
+                                "response": f"👋 Welcome back, {name}! How are you", "patient": record}),
+        ("GET /chat 304 (after)", None),
+        ("POST /chat (before)", {"role": "clinical_agent", "response": SAMPLE_ANSWER, "patient": record}),
+        ("POST /chat (after)", {"role": "clinical_agent", "response": SAMPLE_ANSWER}),
+    ]
+
+    rows = []
+    for label, content in cases:
+        if content is None:
+            rows.append({"case": label, "identity": 0, "gzip": 0, "br": 0 if brotli else None,
+                         "stdlib_us": 0.0, "model_us": 0.0})
+            continue
+        body = stdlib_render(content)
+        row = {"case": label, **_wire_sizes(body), "stdlib_us": round(_time_us(stdlib_render, content, repeats), 2)}
+        row["model_us"] = round(_time_us(model_render, content, repeats), 2)
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /chat response size and serialization time")
+    parser.add_argument("--db", default=str(DB_PATH))
+    parser.add_argument("--repeats", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(args.db, "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    print(f"{'case':<24}{'identity B':>12}{'gzip B':>10}{'br B':>8}{'dict µs':>12}{'model µs':>12}")
+    for row in bench(records, args.repeats):
+        print(f"{row['case']:<24}{row['identity']:>12}{row['gzip']:>10}{str(row['br']):>8}"
+              f"{row['stdlib_us']:>12}{row['model_us']:>12}")
+    print("(body bytes only; a 304 still carries ~100 B of headers)")
@@ -0,0 +1,142 @@
+# backend/tools/bench_workers.py
+#
+# Measure per-worker memory and /chat throughput for 1..N uvicorn workers.
+# Run from the repo root; --sidecar starts the retrieval sidecar and points the
+# workers at it, to compare shared vs per-worker retrieval assets.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.tools.retrieval_protocol import connect, default_socket_path
+
+
+def _workers(pid: int) -> list:
+    """
+    Worker pids under the uvicorn supervisor `pid`, skipping helpers such as the
+    multiprocessing resource tracker. With --workers 1 the app runs in `pid` itself.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            kids = [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        kids = []
+    workers = []
+    for kid in kids:
+        with open(f"/proc/{kid}/cmdline", "rb") as f:
+            if b"spawn_main" in f.read():
+                workers.append(kid)
+    return workers or [pid]
+
+
+def _memory_kb(pid: int) -> tuple:
+    """(RSS, PSS) of a process in kB; PSS splits shared pages between sharers."""
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def _wait_ready(base: str, timeout: float = 300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base}/", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise TimeoutError("Server did not become ready")
+
+
+def _throughput(base: str, patient: str, message: str, requests_total: int, concurrency: int) -> float:
+    payload = {"patient_name": patient, "message": message}
+
+    def one(_):
+        requests.post(f"{base}/chat", json=payload, timeout=120).raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    return requests_total / (time.perf_counter() - start)
+
+
+def _start_sidecar(socket_path: str):
+    """Start the retrieval sidecar and wait until its socket accepts connections."""
+    sidecar = subprocess.Popen(
+        [sys.executable, "-m", "backend.tools.retrieval_server", "--socket", socket_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy(),
+    )
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        try:
+            connect(socket_path).close()
+            return sidecar
+        except OSError:
+            time.sleep(1)
+    sidecar.terminate()
+    raise TimeoutError("Retrieval sidecar did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory and throughput for 1..N uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--patient", default="John Smith")
+    parser.add_argument("--message", default="I have swelling in my legs, is that a kidney symptom?")
+    parser.add_argument("--sidecar", action="store_true", help="Serve retrieval from one shared sidecar")
+    args = parser.parse_args()
+
+    sidecar = None
+    if args.sidecar:
+        socket_path = os.environ.setdefault("RAG_RETRIEVAL_SOCKET", default_socket_path())
+        sidecar = _start_sidecar(socket_path)
+
+    base = f"http://127.0.0.1:{args.port}"
+    print(f"{'workers':>7} {'rss/worker MB':>14} {'pss/worker MB':>14} {'total pss MB':>13} {'req/s':>8}")
+
+    # Every request is for the same patient; don't let the per-patient admission cap shed them
+    env = os.environ.copy()
+    env.setdefault("ADMISSION_MAX_PER_PATIENT", str(args.concurrency))
+
+    for n in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--workers", str(n), "--port", str(args.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+        )
+        try:
+            _wait_ready(base)
+            # Warm every worker so lazily-loaded assets are resident before measuring
+            _throughput(base, args.patient, args.message, n * 4, n * 4)
+            rps = _throughput(base, args.patient, args.message, args.requests, args.concurrency)
+
+            workers = _workers(server.pid)
+            mem = [_memory_kb(pid) for pid in workers]
+            rss = sum(m[0] for m in mem) / len(mem) / 1024
+            pss = sum(m[1] for m in mem) / len(mem) / 1024
+            print(f"{n:>7} {rss:>14.1f} {pss:>14.1f} {pss * len(mem):>13.1f} {rps:>8.2f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    if sidecar:
+        rss, pss = _memory_kb(sidecar.pid)
+        print(f"sidecar: rss {rss / 1024:.1f} MB, pss {pss / 1024:.1f} MB (paid once, on top of the workers)")
+        sidecar.terminate()
+        sidecar.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# backend/tools/encoders.py
+
+import os
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from loguru import logger
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Exported ONNX graphs and tokenizer files are cached here per model
+ONNX_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "onnx"
+
+ONNX_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+# ------------------------------- #
+class SentenceTransformerEncoder:
+    """Reference PyTorch encoder (the embeddings every existing index was built with)."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.index_key = model_name
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        return self.model.encode(
+            list(texts), batch_size=batch_size,
+            show_progress_bar=show_progress_bar, convert_to_numpy=True,
+        ).astype(np.float32)
+
+
+# ------------------------------- #
+def export_onnx(model_name: str, model_dir: Path) -> Path:
+    """Export the transformer to ONNX and save its fast tokenizer (needs torch once)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    onnx_path = model_dir / "model.onnx"
+
+    logger.info(f"Exporting {model_name} to ONNX at {onnx_path}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(dummy[name] for name in ONNX_INPUTS), str(onnx_path),
+            input_names=ONNX_INPUTS, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=14,
+        )
+
+    tokenizer.save_pretrained(str(model_dir))
+    return onnx_path
+
+
+def quantize_onnx(fp32_path: Path) -> Path:
+    """Dynamically quantize weights to int8 (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = fp32_path.with_name("model.int8.onnx")
+    logger.info(f"Quantizing {fp32_path.name} to int8")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class ONNXEncoder:
+    """
+    ONNX Runtime encoder reproducing all-MiniLM-L6-v2's pipeline
+    (transformer -> mean pooling -> L2 normalize) without importing torch.
+
+    The fp32 graph matches the PyTorch embeddings and shares their index;
+    the int8 graph is close but not identical, so it gets its own index key.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, quantize: bool = False,
+                 cache_dir: Path = ONNX_CACHE_DIR, max_length: int = 256, threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        onnx_path = model_dir / "model.onnx"
+        if not onnx_path.exists():
+            export_onnx(model_name, model_dir)
+        if quantize:
+            int8_path = onnx_path.with_name("model.int8.onnx")
+            onnx_path = int8_path if int8_path.exists() else quantize_onnx(onnx_path)
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self.dim = self.session.get_outputs()[0].shape[-1]
+        self.index_key = f"{model_name}:onnx-int8" if quantize else model_name
+        self._tokenize_one = lru_cache(maxsize=4096)(self._tokenize_uncached)
+        logger.info(f"ONNX encoder ready ({onnx_path.name}, dim={self.dim})")
+
+    def _tokenize_uncached(self, text: str):
+        enc = self.tokenizer.encode(text)
+        return tuple(enc.ids), tuple(enc.attention_mask), tuple(enc.type_ids)
+
+    def _tokenize(self, texts: list) -> dict:
+        if len(texts) == 1:
+            # Single queries repeat a lot (same questions from many patients)
+            rows = [self._tokenize_one(texts[0])]
+        else:
+            rows = [(e.ids, e.attention_mask, e.type_ids) for e in self.tokenizer.encode_batch(texts)]
+        arrays = [np.asarray(col, dtype=np.int64) for col in zip(*rows)]
+        return {name: arr for name, arr in zip(ONNX_INPUTS, arrays) if name in self._input_names}
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        texts = list(texts)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            feeds = self._tokenize(texts[start:start + batch_size])
+            hidden = self.session.run(["last_hidden_state"], feeds)[0]
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out[start:start + len(pooled)] = pooled / np.clip(
+                np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+# ------------------------------- #
+ENCODERS = {
+    "torch": lambda model_name: SentenceTransformerEncoder(model_name),
+    "onnx": lambda model_name: ONNXEncoder(model_name),
+    "onnx-int8": lambda model_name: ONNXEncoder(model_name, quantize=True),
+}
+
+
+def get_encoder(backend: str = None, model_name: str = DEFAULT_MODEL):
+    """Build an encoder by name: 'torch' (default), 'onnx' or 'onnx-int8' (env RAG_ENCODER)."""
+    backend = backend or os.getenv("RAG_ENCODER", "torch")
+    if backend not in ENCODERS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {sorted(ENCODERS)}")
+    return ENCODERS[backend](model_name)
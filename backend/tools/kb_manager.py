@@ -0,0 +1,317 @@
+# backend/tools/kb_manager.py
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.chunk_store import ChunkStore, ChunkStoreWriter
+
+# Versioned knowledge base layout:
+#   <kb_dir>/CURRENT                 name of the version RAGTool serves
+#   <kb_dir>/versions/v0001/         chunk store + faiss_index.bin + index.meta.json + documents.json
+DEFAULT_KB_DIR = Path(__file__).resolve().parent.parent / "data" / "kb"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".update.lock"
+INDEX_FILE = "faiss_index.bin"
+INDEX_META_FILE = "index.meta.json"
+DOCUMENTS_FILE = "documents.json"  # {file name: sha256} of every PDF in the version
+
+# Static corpus served before any version exists; the first version starts from it
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_SEED_CHUNKS = DATA_DIR / "chunks" / "nephrology_store"
+DEFAULT_SEED_INDEX = DATA_DIR / "embeddings" / "faiss_index.bin"
+
+
+def version_dir(kb_dir, version: str) -> Path:
+    return Path(kb_dir) / "versions" / version
+
+
+def reembedded_index_path(kb_dir, version: str, index_key: str) -> Path:
+    """Index of `version` rebuilt by RAGTool for an encoder other than the one that built it."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", index_key).strip("_")
+    return version_dir(kb_dir, version) / f"faiss_index.{slug}.bin"
+
+
+def list_versions(kb_dir) -> list:
+    root = Path(kb_dir) / "versions"
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / INDEX_FILE).exists())
+
+
+def current_version(kb_dir):
+    """Version currently served, or None if the KB has not been built yet."""
+    try:
+        with open(Path(kb_dir) / CURRENT_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate(kb_dir, version: str):
+    """Atomically point CURRENT at `version`; serving processes pick it up on their next check."""
+    if version not in list_versions(kb_dir):
+        raise ValueError(f"Unknown KB version: {version}")
+    tmp = Path(kb_dir) / (CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, Path(kb_dir) / CURRENT_FILE)
+    logger.success(f"✅ KB version {version} is now active")
+
+
+def read_index_meta(kb_dir, version: str) -> dict:
+    with open(version_dir(kb_dir, version) / INDEX_META_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_documents(kb_dir, version: str) -> dict:
+    try:
+        with open(version_dir(kb_dir, version) / DOCUMENTS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _UpdateLock:
+    """Cross-process guard so two updates never build the same next version."""
+
+    def __init__(self, kb_dir):
+        self.path = Path(kb_dir) / LOCK_FILE
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError(f"Another KB update is running (remove {self.path} if it is stale)")
+        return self
+
+    def __exit__(self, *exc):
+        os.close(self.fd)
+        os.unlink(self.path)
+
+
+def _open_seed(seed_chunks):
+    """The static chunk store the first version starts from (None if there is none)."""
+    if not seed_chunks or not Path(seed_chunks).exists():
+        logger.warning(f"⚠️ No static chunk store at {seed_chunks}; the first KB version holds only the new documents")
+        return None
+    if not Path(seed_chunks).is_dir():
+        raise ValueError(f"{seed_chunks} is not a chunk store directory; rebuild it with pdf_parser "
+                         f"before creating the first KB version")
+    return ChunkStore(seed_chunks)
+
+
+def _seed_index(seed_store, seed_index, encoder):
+    """
+    FAISS index for the static chunks: the static index when it was built by this
+    encoder from exactly these chunks (same checks as RAGTool), else re-embedded.
+    """
+    import faiss
+
+    meta_path = Path(str(seed_index).replace(".bin", ".meta.json")) if seed_index else None
+    if seed_index and Path(seed_index).exists():
+        meta = {"encoder": encoder.model_name}  # indexes from before pluggable encoders
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        index = faiss.read_index(str(seed_index))
+        checksum = meta.get("chunks_checksum")
+        if (meta.get("encoder") == encoder.index_key and checksum in (None, seed_store.checksum)
+                and index.d == encoder.dim and index.ntotal == len(seed_store)):
+            logger.info(f"Seeding the first KB version from {seed_index}")
+            return index
+        logger.warning(f"⚠️ {seed_index} does not match the static chunks or encoder — re-embedding them")
+
+    logger.info(f"Embedding {len(seed_store)} static chunks for the first KB version")
+    index = faiss.IndexFlatL2(encoder.dim)
+    index.add(encoder.encode(seed_store, show_progress_bar=True))
+    return index
+
+
+# ------------------------------- #
+def add_documents(pdf_paths, kb_dir=DEFAULT_KB_DIR, encoder=None, activate_version: bool = True,
+                  dedup_threshold: float = 0.8, seed_chunks=DEFAULT_SEED_CHUNKS,
+                  seed_index=DEFAULT_SEED_INDEX) -> dict:
+    """
+    Build the next KB version = current version + the given PDFs.
+
+    Existing chunks are copied and their vectors reused from the current FAISS
+    index; only the new documents are chunked and embedded. New chunks that
+    near-duplicate a chunk already in the KB are dropped and recorded as extra
+    provenance of that chunk. A document already in the KB with identical
+    content is skipped; a different file under a known name raises ValueError
+    (a revised guideline needs a new file name or a rebuild). The new version
+    is activated with an atomic pointer swap, and older versions are kept for
+    rollback.
+
+    The first version starts from the static chunk store (`seed_chunks`) and
+    its index (`seed_index`) that RAGTool serves until then, so activating it
+    does not drop the existing corpus.
+    """
+    import faiss
+    from backend.tools.encoders import get_encoder
+    from backend.utils.dedup import NearDuplicateFilter, dedup_stats
+    from backend.utils.pdf_parser import ingest_pdf
+
+    with _UpdateLock(kb_dir):
+        base = current_version(kb_dir)
+        base_store = ChunkStore(version_dir(kb_dir, base)) if base else _open_seed(seed_chunks)
+        documents = read_documents(kb_dir, base) if base else {}
+        # Documents whose chunks were all de-duplicated have no chunks but are still known
+        known = (set(base_store.sources) if base_store else set()) | set(documents)
+
+        new_docs, hashes = [], {}
+        for p in pdf_paths:
+            name, digest = Path(p).name, file_sha256(p)
+            if name in known or name in hashes:
+                if documents.get(name, hashes.get(name)) != digest:
+                    raise ValueError(f"'{name}' is already in the KB with different (or unrecorded) content; "
+                                     f"add the revision under a new file name or rebuild the KB")
+                logger.info(f"'{name}' is already in the KB, skipping")
+                continue
+            new_docs.append(p)
+            hashes[name] = digest
+        if not new_docs:
+            logger.info("No new documents to add")
+            return {"version": base, "added_documents": 0, "added_chunks": 0}
+
+        encoder = encoder or get_encoder()
+        if base:
+            base_meta = read_index_meta(kb_dir, base)
+            if base_meta["encoder"] != encoder.index_key:
+                raise ValueError(f"KB {base} was embedded with '{base_meta['encoder']}', "
+                                 f"not '{encoder.index_key}'; rebuild it from scratch")
+
+        versions = list_versions(kb_dir)
+        number = int(versions[-1][1:]) + 1 if versions else 1
+        version = f"v{number:04d}"
+        out_dir = version_dir(kb_dir, version)
+
+        try:
+            dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+            added, seen, seen_bytes = 0, 0, 0
+            with ChunkStoreWriter(out_dir) as store:
+                if base_store:
+                    # Existing chunks already have vectors, so they are always kept
+                    for i in range(len(base_store)):
+                        text, meta = base_store[i], base_store.metadata(i)
+                        store.add(text, meta["source"], meta["page"])
+                        for dup in meta.get("duplicates", []):
+                            store.add_provenance(i, dup["source"], dup["page"])
+                        if dedup:
+                            dedup.add(text, force_keep=True)
+                base_count, base_bytes = len(store), store.nbytes
+                for pdf_path in new_docs:
+                    kept, n, nbytes = ingest_pdf(store, pdf_path, dedup)
+                    added += kept
+                    seen += n
+                    seen_bytes += nbytes
+                total = len(store)
+                stats = dedup_stats(seen, added, seen_bytes, store.nbytes - base_bytes, encoder.dim)
+            logger.info(f"Dropped {stats['chunks_removed']} near-duplicate chunks of {seen}")
+
+            if base:
+                index = faiss.read_index(str(version_dir(kb_dir, base) / INDEX_FILE))
+            elif base_store:
+                index = _seed_index(base_store, seed_index, encoder)
+            else:
+                index = faiss.IndexFlatL2(encoder.dim)
+            # Every new chunk may have been a duplicate (or the PDFs had no text)
+            if added:
+                # New chunks are read back from the published (memory-mapped) store
+                new_store = ChunkStore(out_dir)
+                logger.info(f"Embedding {added} new chunks for {version}")
+                index.add(encoder.encode([new_store[i] for i in range(base_count, total)], show_progress_bar=True))
+
+            faiss.write_index(index, str(out_dir / INDEX_FILE))
+            with open(out_dir / DOCUMENTS_FILE, "w", encoding="utf-8") as f:
+                json.dump({**documents, **hashes}, f, indent=2)
+            with open(out_dir / INDEX_META_FILE, "w", encoding="utf-8") as f:
+                json.dump({"encoder": encoder.index_key, "dim": int(index.d), "count": total,
+                           "base_version": base or (str(seed_chunks) if base_store else None)}, f, indent=2)
+        except Exception:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+
+    if activate_version:
+        activate(kb_dir, version)
+
+    return {"version": version, "base_version": base, "added_documents": len(new_docs),
+            "added_chunks": added, "total_chunks": total, "dedup": stats}
+
+
+def rollback(kb_dir=DEFAULT_KB_DIR, version: str = None) -> str:
+    """Re-activate `version`, or the one before the current version."""
+    if version is None:
+        versions, current = list_versions(kb_dir), current_version(kb_dir)
+        older = [v for v in versions if current and v < current]
+        if not older:
+            raise ValueError("No older KB version to roll back to")
+        version = older[-1]
+    activate(kb_dir, version)
+    return version
+
+
+def prune(kb_dir=DEFAULT_KB_DIR, keep: int = 5) -> list:
+    """Delete all but the newest `keep` versions (never the active one)."""
+    current = current_version(kb_dir)
+    stale = [v for v in list_versions(kb_dir)[:-keep] if v != current] if keep > 0 else []
+    for v in stale:
+        shutil.rmtree(version_dir(kb_dir, v))
+    return stale
+
+
+# ------------------------------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned RAG knowledge base")
+    parser.add_argument("--kb-dir", default=os.getenv("RAG_KB_DIR", str(DEFAULT_KB_DIR)))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="Chunk, embed and publish new PDFs as a new version")
+    add.add_argument("pdfs", nargs="+")
+    add.add_argument("--no-activate", action="store_true")
+    add.add_argument("--dedup-threshold", type=float, default=0.8, help="0 disables near-duplicate removal")
+    add.add_argument("--seed-chunks", default=str(DEFAULT_SEED_CHUNKS),
+                     help="Static chunk store the first version starts from")
+    add.add_argument("--seed-index", default=str(DEFAULT_SEED_INDEX), help="FAISS index of --seed-chunks")
+
+    rb = sub.add_parser("rollback", help="Serve an older version again")
+    rb.add_argument("version", nargs="?")
+
+    pr = sub.add_parser("prune", help="Delete old versions")
+    pr.add_argument("--keep", type=int, default=5)
+
+    sub.add_parser("list", help="List versions")
+
+    args = parser.parse_args()
+    if args.command == "add":
+        print(json.dumps(add_documents(args.pdfs, args.kb_dir, activate_version=not args.no_activate,
+                                       dedup_threshold=args.dedup_threshold, seed_chunks=args.seed_chunks,
+                                       seed_index=args.seed_index), indent=2))
+    elif args.command == "rollback":
+        print(f"Active version: {rollback(args.kb_dir, args.version)}")
+    elif args.command == "prune":
+        print(f"Removed: {prune(args.kb_dir, args.keep)}")
+    else:
+        current = current_version(args.kb_dir)
+        for v in list_versions(args.kb_dir):
+            print(("* " if v == current else "  ") + v)
@@ -1,16 +1,100 @@
+import os
+import contextvars
+from contextlib import contextmanager
+from types import SimpleNamespace
 from huggingface_hub import InferenceClient
 
-# Initialize client (no provider needed)
-client = InferenceClient("mistralai/Mistral-7B-Instruct-v0.2")
+DEFAULT_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
 
-# Use the chat completion endpoint
-response = client.chat.completions.create(
-    model="mistralai/Mistral-7B-Instruct-v0.2",
-    messages=[
-        {"role": "system", "content": "You are a helpful medical assistant."},
-        {"role": "user", "content": "What is kidney"}
-    ],
-    max_tokens=200,
-)
+# Token usage of the LLM calls made in the current context (see track_usage)
+_usage = contextvars.ContextVar("llm_usage", default=None)
 
-print(response.choices[0].message["content"])
+
+def llm_backend() -> str:
+    """Active LLM backend: 'hf' (Hugging Face Inference, default) or 'stub' (offline)."""
+    return os.getenv("LLM_BACKEND", "hf")
+
+
+# ------------------------------- #
+class StubLLMClient:
+    """
+    Offline stand-in for InferenceClient with the same chat.completions.create shape.
+    Replies are deterministic and token counts are whitespace-based estimates.
+    """
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, max_tokens: int = 400, **kwargs):
+        prompt = messages[-1]["content"]
+        content = f"[stub reply] {' '.join(prompt.split()[:40])}"
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        completion_tokens = min(len(content.split()), max_tokens)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message={"role": "assistant", "content": content})],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+class UsageTrackingClient:
+    """Wrap a chat client and add each completion's token usage to track_usage()."""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, *args, **kwargs):
+        try:
+            completion = self._client.chat.completions.create(*args, **kwargs)
+        except Exception as e:
+            # Agents turn LLM errors into apology text; keep the failure visible to the tracker
+            record_failure(f"LLM call failed: {e}")
+            raise
+        usage, counters = getattr(completion, "usage", None), _usage.get()
+        if usage is not None and counters is not None:
+            counters["calls"] += 1
+            counters["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            counters["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        return completion
+
+
+def record_failure(message: str):
+    """Note a failure that an agent handled by returning fallback text (no-op outside track_usage)."""
+    counters = _usage.get()
+    if counters is not None:
+        counters["errors"].append(message)
+
+
+@contextmanager
+def track_usage():
+    """Collect token usage and swallowed failures of the LLM calls made inside the block (per thread/task)."""
+    counters = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "errors": []}
+    token = _usage.set(counters)
+    try:
+        yield counters
+    finally:
+        _usage.reset(token)
+
+
+def get_llm_client(model: str = DEFAULT_MODEL, token: str = None):
+    """Chat client for the active backend (LLM_BACKEND=hf|stub)."""
+    if llm_backend() == "stub":
+        return UsageTrackingClient(StubLLMClient())
+    return UsageTrackingClient(InferenceClient(model=model, token=token))
+
+
+if __name__ == "__main__":
+    client = get_llm_client()
+    response = client.chat.completions.create(
+        model=DEFAULT_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful medical assistant."},
+            {"role": "user", "content": "What is kidney"}
+        ],
+        max_tokens=200,
+    )
+    print(response.choices[0].message["content"])
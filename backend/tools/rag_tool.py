@@ -1,73 +1,268 @@
 # backend/tools/rag_tool.py
 
 import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
 from loguru import logger
-from huggingface_hub import InferenceClient
 import os
+from backend.tools.encoders import get_encoder
+from backend.tools.llm_tool import get_llm_client, llm_backend
+from backend.utils.chunk_store import ChunkStore
+from backend.tools import kb_manager
+from backend.tools.retrieval_protocol import connect, recv_message, send_message
+
+# What one query searches: an immutable (version, chunks, index) triple. A version
+# swap replaces the whole snapshot, so in-flight queries finish on the old one.
+KBSnapshot = namedtuple("KBSnapshot", ["version", "chunks", "index"])
+
+# How often the versioned KB's CURRENT pointer is checked (seconds)
+RELOAD_CHECK_INTERVAL = 2.0
+
+ANSWER_CACHE_SIZE = 512
 
 
 class RAGTool:
     def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2",
-                 chunks_path="E:\\assi\\backend\\data\\chunks\\nephrology_chunks.json",
-                 index_path="E:\\assi\\backend\\data\\embeddings\\faiss_index.bin"):
+                 chunks_path="E:\\assi\\backend\\data\\chunks\\nephrology_store",
+                 index_path="E:\\assi\\backend\\data\\embeddings\\faiss_index.bin",
+                 retrieval_socket=None, encoder=None, kb_dir=None):
         self.model_name = model_name
         self.chunks_path = chunks_path
         self.index_path = index_path
+        self.retrieval_socket = retrieval_socket
+        # Versioned, hot-updatable KB (backend.tools.kb_manager); the static store is
+        # served until a first version is activated there
+        self.kb_dir = str(kb_dir or os.getenv("RAG_KB_DIR", str(kb_manager.DEFAULT_KB_DIR)))
+        self._local = threading.local()
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._failed_version = None  # not retried until CURRENT names another version
+        self._last_check = time.monotonic()
+        self._answer_cache = OrderedDict()
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
 
-        logger.info(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        self.chunks = self._load_chunks()
-        self.index, self.embeddings = self._build_or_load_index()
+        if retrieval_socket:
+            # Model, chunks and index live once in the retrieval sidecar
+            logger.info(f"Using shared retrieval service at {retrieval_socket}")
+            self.encoder, self.chunks, self.index, self.embeddings = None, None, None, None
+        else:
+            # Encoder backend is pluggable: RAG_ENCODER=torch (default) | onnx | onnx-int8
+            logger.info(f"Loading embedding model: {model_name}")
+            self.encoder = encoder or get_encoder(model_name=model_name)
+            if self.kb_dir and kb_manager.current_version(self.kb_dir):
+                self._snapshot = self._load_version(kb_manager.current_version(self.kb_dir))
+                self.chunks, self.index, self.embeddings = self._snapshot.chunks, self._snapshot.index, None
+            else:
+                self.chunks = self._load_chunks()
+                self.index, self.embeddings = self._build_or_load_index()
+                self._snapshot = KBSnapshot("static", self.chunks, self.index)
 
-        # Initialize Hugging Face client
+        # Initialize LLM client (LLM_BACKEND=hf|stub)
         hf_token = os.getenv("HF_TOKEN")
-        if not hf_token:
+        if not hf_token and llm_backend() == "hf":
             logger.warning("⚠️ HF_TOKEN not set. LLM generation will fail if used.")
-        self.client = InferenceClient(
-            model="mistralai/Mistral-7B-Instruct-v0.2",
-            token=hf_token
-        )
+        self.client = get_llm_client(token=hf_token)
 
     # ------------------------------- #
     def _load_chunks(self):
         logger.info(f"Loading chunks from {self.chunks_path}")
+        if Path(self.chunks_path).is_dir():
+            # Memory-mapped store written by pdf_parser: chunks are decoded on access
+            return ChunkStore(self.chunks_path)
+
+        # Legacy JSON list of strings
         with open(self.chunks_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    # ------------------------------- #
+    def _index_is_compatible(self, meta_path: Path) -> bool:
+        """An index can be reused only if it was built by an equivalent encoder."""
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            # Indexes built before encoders were pluggable came from the PyTorch model
+            meta = {"encoder": self.model_name}
+
+        if meta.get("encoder") != self.encoder.index_key:
+            logger.warning(f"⚠️ Index was built with '{meta.get('encoder')}', "
+                           f"encoder is '{self.encoder.index_key}' — rebuilding")
+            return False
+        # Re-chunking (e.g. dedup or overlap changes) can keep the count but change the text
+        checksum = getattr(self.chunks, "checksum", None)
+        if meta.get("chunks_checksum") is not None and checksum is not None and meta["chunks_checksum"] != checksum:
+            logger.warning("⚠️ Chunk store changed since the index was built — rebuilding")
+            return False
+        return True
+
     # ------------------------------- #
     def _build_or_load_index(self):
         """Load FAISS index if exists; else create and save"""
         Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
+        meta_path = Path(self.index_path.replace(".bin", ".meta.json"))
 
-        if Path(self.index_path).exists():
+        if Path(self.index_path).exists() and self._index_is_compatible(meta_path):
             logger.info("Loading existing FAISS index...")
             index = faiss.read_index(self.index_path)
-            embeddings = np.load(self.index_path.replace(".bin", ".npy"))
-            return index, embeddings
+            # Memory-mapped: the raw matrix is not needed for search, so keep it out of RSS
+            embeddings = np.load(self.index_path.replace(".bin", ".npy"), mmap_mode="r")
+            if index.d == self.encoder.dim and index.ntotal == len(self.chunks):
+                return index, embeddings
+            logger.warning(f"⚠️ Index ({index.ntotal} x {index.d}) does not match "
+                           f"{len(self.chunks)} chunks x {self.encoder.dim} dims — rebuilding")
 
         logger.info("Creating new FAISS index...")
-        embeddings = self.model.encode(self.chunks, show_progress_bar=True, convert_to_numpy=True)
+        embeddings = self.encoder.encode(self.chunks, show_progress_bar=True)
         dim = embeddings.shape[1]
         index = faiss.IndexFlatL2(dim)
         index.add(embeddings)
 
         faiss.write_index(index, self.index_path)
         np.save(self.index_path.replace(".bin", ".npy"), embeddings)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"encoder": self.encoder.index_key, "dim": int(dim), "count": len(self.chunks),
+                       "chunks_checksum": getattr(self.chunks, "checksum", None)}, f)
         logger.success(f"✅ FAISS index created with {len(self.chunks)} chunks")
         return index, embeddings
 
+    # ------------------------------- #
+    def _load_version(self, version: str) -> KBSnapshot:
+        """Open one immutable KB version (memory-mapped chunks + its FAISS index)."""
+        meta = kb_manager.read_index_meta(self.kb_dir, version)
+        vdir = kb_manager.version_dir(self.kb_dir, version)
+        chunks = ChunkStore(vdir)
+        if meta["encoder"] == self.encoder.index_key:
+            index = faiss.read_index(str(vdir / kb_manager.INDEX_FILE))
+        else:
+            index = self._reembedded_index(version, meta, chunks)
+        logger.info(f"Loaded KB version {version} ({index.ntotal} chunks)")
+        return KBSnapshot(version, chunks, index)
+
+    def _reembedded_index(self, version: str, meta: dict, chunks) -> faiss.Index:
+        """
+        A version embedded by another encoder (e.g. torch vs onnx-int8) is searched
+        with an index rebuilt by this one. It is saved beside the version's own
+        index, so each version is re-embedded once per encoder.
+        """
+        path = kb_manager.reembedded_index_path(self.kb_dir, version, self.encoder.index_key)
+        if path.exists():
+            index = faiss.read_index(str(path))
+            if index.d == self.encoder.dim and index.ntotal == len(chunks):
+                return index
+
+        logger.warning(f"⚠️ KB {version} was embedded with '{meta['encoder']}', encoder is "
+                       f"'{self.encoder.index_key}' — re-embedding {len(chunks)} chunks")
+        index = faiss.IndexFlatL2(self.encoder.dim)
+        index.add(self.encoder.encode(chunks, show_progress_bar=True))
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            faiss.write_index(index, str(tmp))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save re-embedded index for {version}: {e}")
+        return index
+
+    def _reload(self, version: str):
+        """Load a new version off the request path, then swap it in with one assignment."""
+        try:
+            snapshot = self._load_version(version)
+            self._snapshot = snapshot
+            self.chunks, self.index = snapshot.chunks, snapshot.index
+            logger.success(f"✅ Now serving KB version {version}")
+        except Exception as e:
+            self._failed_version = version
+            logger.error(f"❌ Could not load KB version {version}, still serving {self._snapshot.version}: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def _current_snapshot(self) -> KBSnapshot:
+        """Snapshot for this query; notices CURRENT changes and reloads in the background."""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if self.kb_dir and now - self._last_check >= RELOAD_CHECK_INTERVAL:
+            self._last_check = now
+            version = kb_manager.current_version(self.kb_dir)
+            if (version and version not in (snapshot.version, self._failed_version)
+                    and self._reload_lock.acquire(blocking=False)):
+                threading.Thread(target=self._reload, args=(version,), daemon=True).start()
+        return snapshot
+
+    @property
+    def kb_version(self):
+        """KB version this process is serving (None when retrieval is remote)."""
+        return self._snapshot.version if self._snapshot else None
+
     # ------------------------------- #
     def retrieve(self, query: str, top_k: int = 3):
         """Retrieve top-k relevant chunks for a query"""
-        query_emb = self.model.encode([query], convert_to_numpy=True)
-        D, I = self.index.search(query_emb, top_k)
-        results = [{"score": float(D[0][i]), "text": self.chunks[I[0][i]]} for i in range(top_k)]
+        if self.retrieval_socket:
+            return self._remote_retrieve(query, top_k)
+
+        snapshot = self._current_snapshot()
+        query_emb = self.encoder.encode([query])
+        D, I = snapshot.index.search(query_emb, top_k)
+
+        results = []
+        for score, idx in zip(D[0], I[0]):
+            if idx < 0:  # fewer than top_k chunks in the index
+                continue
+            idx = int(idx)
+            result = {"score": float(score), "text": snapshot.chunks[idx], "kb_version": snapshot.version}
+            if isinstance(snapshot.chunks, ChunkStore):
+                result.update(snapshot.chunks.metadata(idx))
+            results.append(result)
         return results
 
+    # ------------------------------- #
+    def _remote_retrieve(self, query: str, top_k: int):
+        """Forward a retrieval to the sidecar; one persistent connection per thread."""
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    conn = self._local.conn = connect(self.retrieval_socket)
+                send_message(conn, {"op": "retrieve", "query": query, "top_k": top_k})
+                reply = recv_message(conn)
+                break
+            except PermissionError:
+                raise
+            except (OSError, EOFError):
+                # Sidecar restarted or connection dropped: reconnect once
+                if conn is not None:
+                    conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+        if reply.get("status") != "ok":
+            raise RuntimeError(f"Retrieval service error: {reply.get('error')}")
+        return reply["results"]
+
+    # ------------------------------- #
+    def _cached_answer(self, version, key):
+        """Answers are only valid for the KB version they were generated from."""
+        with self._cache_lock:
+            if version != self._cache_version:
+                self._answer_cache.clear()
+                self._cache_version = version
+            if key in self._answer_cache:
+                self._answer_cache.move_to_end(key)
+                return dict(self._answer_cache[key])
+        return None
+
+    def _cache_answer(self, version, key, result: dict):
+        with self._cache_lock:
+            if version != self._cache_version:
+                return  # KB changed while the LLM was answering
+            self._answer_cache[key] = dict(result)
+            if len(self._answer_cache) > ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
+
     # ------------------------------- #
     def generate_answer(self, query: str, top_k: int = 3):
         """
@@ -77,6 +272,13 @@ class RAGTool:
         retrieved = self.retrieve(query, top_k)
         context = "\n\n".join([r["text"] for r in retrieved])
 
+        version = retrieved[0].get("kb_version") if retrieved else None
+        cache_key = (" ".join(query.lower().split()), top_k)
+        cached = self._cached_answer(version, cache_key)
+        if cached:
+            logger.info(f"♻️ Answer cache hit (KB {version})")
+            return cached
+
         prompt = f"""
         You are a medical assistant helping with nephrology-related post-discharge care.
         Based on the context below, answer the user's question accurately and safely.
@@ -102,16 +304,20 @@ class RAGTool:
             answer = completion.choices[0].message["content"]
             logger.success("✅ Response generated successfully")
 
-            return {
+            result = {
                 "context": context,
-                "answer": answer
+                "answer": answer,
+                "kb_version": version
             }
+            self._cache_answer(version, cache_key, result)
+            return result
 
         except Exception as e:
             logger.error(f"❌ RAG generation error: {e}")
             return {
                 "context": context,
-                "answer": "Sorry, I encountered an issue generating the medical response."
+                "answer": "Sorry, I encountered an issue generating the medical response.",
+                "kb_version": version
             }
 
 
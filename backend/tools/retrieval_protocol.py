@@ -0,0 +1,75 @@
+# backend/tools/retrieval_protocol.py
+
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+
+# Wire format between workers and the retrieval sidecar: 4-byte big-endian
+# length + UTF-8 JSON. Nothing read from the socket is ever unpickled.
+_LENGTH = struct.Struct("!I")
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def default_socket_path() -> str:
+    """Per-user socket in a private directory, e.g. $XDG_RUNTIME_DIR/rag-retrieval-1000/retrieval.sock."""
+    base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"rag-retrieval-{os.getuid()}", "retrieval.sock")
+
+
+def check_private_dir(path: str, create: bool = False):
+    """
+    The socket's directory must be a real directory owned by this user with no
+    group/other access; otherwise another local user could bind or connect to it.
+    """
+    if create:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"Socket directory {path} must be owned by this user with mode 0700")
+
+
+def check_peer(sock: socket.socket):
+    """Refuse peers running as another user (Linux SO_PEERCRED; other platforms rely on the 0700 directory)."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    if uid != os.getuid():
+        raise PermissionError(f"Refusing retrieval peer running as uid {uid}")
+
+
+def connect(socket_path: str) -> socket.socket:
+    check_private_dir(os.path.dirname(os.path.abspath(socket_path)))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        check_peer(sock)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def send_message(sock: socket.socket, message):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            raise EOFError("Retrieval connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket):
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Retrieval message too large ({size} bytes)")
+    return json.loads(_recv_exact(sock, size))
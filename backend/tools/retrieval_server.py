@@ -0,0 +1,85 @@
+# backend/tools/retrieval_server.py
+
+import argparse
+import os
+import socket
+import sys
+import threading
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.tools.rag_tool import RAGTool
+from backend.tools.retrieval_protocol import (
+    check_peer, check_private_dir, default_socket_path, recv_message, send_message
+)
+
+DEFAULT_SOCKET = default_socket_path()
+
+# Upper bound on results per request, so one request cannot ask for the whole index
+MAX_TOP_K = 100
+
+
+def _handle(rag: RAGTool, conn: socket.socket):
+    """Serve retrieval requests on one worker connection until it closes."""
+    with conn:
+        try:
+            check_peer(conn)
+        except PermissionError as e:
+            logger.warning(f"⚠️ {e}")
+            return
+
+        while True:
+            try:
+                request = recv_message(conn)
+            except (EOFError, OSError, ValueError):
+                return  # closed, or not speaking the protocol
+
+            try:
+                if not isinstance(request, dict) or request.get("op") != "retrieve":
+                    raise ValueError("Unknown operation")
+                query, top_k = request.get("query"), request.get("top_k", 3)
+                if not isinstance(query, str) or not isinstance(top_k, int) or not 0 < top_k <= MAX_TOP_K:
+                    raise ValueError("Invalid retrieve request")
+                reply = {"status": "ok", "results": rag.retrieve(query, top_k)}
+            except Exception as e:
+                logger.error(f"❌ Retrieval error: {e}")
+                reply = {"status": "error", "error": str(e)}
+
+            try:
+                send_message(conn, reply)
+            except OSError:
+                return
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, rag: RAGTool = None):
+    """
+    Load the embedding model, chunks and FAISS index once and serve `retrieve`
+    over a Unix socket, so N uvicorn workers share a single copy of them.
+    """
+    rag = rag or RAGTool()
+
+    check_private_dir(os.path.dirname(os.path.abspath(socket_path)), create=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # socket file is 0600 from the moment it exists
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(64)
+
+    with listener:
+        logger.success(f"✅ Retrieval service listening on {socket_path}")
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=_handle, args=(rag, conn), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared RAG retrieval sidecar for multi-worker serving")
+    parser.add_argument("--socket", default=os.getenv("RAG_RETRIEVAL_SOCKET", DEFAULT_SOCKET))
+    args = parser.parse_args()
+    serve(args.socket)
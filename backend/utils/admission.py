@@ -0,0 +1,179 @@
+# backend/utils/admission.py
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+
+# Lower value = served first
+PRIORITIES = {"medical": 0, "web": 1, "general": 2}
+
+# How long a request of each class may wait for an LLM slot before giving up (seconds)
+QUEUE_DEADLINES = {"medical": 30.0, "web": 15.0, "general": 10.0}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to 503 + Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized admission for LLM-bound requests.
+
+    At most `max_concurrent` requests hold a slot; up to `max_queue` wait in a
+    heap ordered by (route priority, patient's position among their own waiting
+    requests, arrival). The middle term gives per-patient fairness: a patient's
+    second queued request sorts behind every other patient's first one in the
+    same class. When the queue is full a higher-priority arrival evicts the
+    lowest-priority waiter; otherwise a full queue, too many requests from one
+    patient, or a missed queue deadline all fail fast with AdmissionRejected.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 64, max_queued_per_patient: int = 4,
+                 deadlines: dict = None, window: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_patient = max_queued_per_patient
+        self.deadlines = {**QUEUE_DEADLINES, **(deadlines or {})}
+
+        self._in_flight = 0
+        self._heap = []
+        self._waiting = 0
+        self._seq = itertools.count()
+        self._queued_by_patient = defaultdict(int)
+        self._queued_by_route = defaultdict(int)
+
+        # Rolling samples for metrics and Retry-After estimates
+        self._waits = {route: deque(maxlen=window) for route in PRIORITIES}
+        self._service_times = deque(maxlen=window)
+        self._counters = defaultdict(int)
+
+    # ------------------------------- #
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+        service = sum(self._service_times) / len(self._service_times) if self._service_times else 5.0
+        return max(1, math.ceil(service * (self._waiting + 1) / self.max_concurrent))
+
+    def _reject(self, route: str, reason: str):
+        self._counters[f"rejected_{reason}"] += 1
+        self._counters[f"rejected_{route}"] += 1
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _grant_next(self):
+        """Hand free slots to the highest-priority live waiters."""
+        while self._heap and self._in_flight < self.max_concurrent:
+            _, future, _, _ = heapq.heappop(self._heap)
+            if future.done():  # timed out or client went away
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _preempt(self, route: str) -> bool:
+        """On a full queue, evict the lowest-priority waiter if `route` outranks it."""
+        live = [entry for entry in self._heap if not entry[1].done()]
+        if not live:
+            return False
+        key, future, _, victim_route = max(live, key=lambda entry: entry[0])
+        if key[0] <= PRIORITIES.get(route, len(PRIORITIES)):
+            return False
+        self._counters["rejected_preempted"] += 1
+        self._counters[f"rejected_{victim_route}"] += 1
+        future.set_exception(AdmissionRejected("preempted", self._retry_after()))
+        return True
+
+    def _dequeued(self, patient: str, route: str):
+        self._waiting -= 1
+        self._queued_by_route[route] -= 1
+        self._queued_by_patient[patient] -= 1
+        if not self._queued_by_patient[patient]:
+            del self._queued_by_patient[patient]
+
+    async def _acquire(self, route: str, patient: str):
+        if self._in_flight < self.max_concurrent and not self._waiting:
+            self._in_flight += 1
+            return 0.0
+
+        # Per-patient limit first: only a request that will really be queued may evict a waiter
+        if self._queued_by_patient.get(patient, 0) >= self.max_queued_per_patient:
+            self._reject(route, "patient_limit")
+        if self._waiting >= self.max_queue and not self._preempt(route):
+            self._reject(route, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        key = (PRIORITIES.get(route, len(PRIORITIES)), self._queued_by_patient[patient], next(self._seq))
+        heapq.heappush(self._heap, (key, future, patient, route))
+        self._waiting += 1
+        self._queued_by_route[route] += 1
+        self._queued_by_patient[patient] += 1
+
+        enqueued = time.monotonic()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.deadlines.get(route, 10.0))
+        except asyncio.CancelledError:
+            # Client disconnected: give back a slot granted in the meantime (a pre-empted
+            # waiter's future holds an exception and never got a slot)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._in_flight -= 1
+                self._grant_next()
+            future.cancel()
+            raise
+        finally:
+            self._dequeued(patient, route)
+
+        if not done:
+            future.cancel()
+            self._reject(route, "deadline")
+        if future.exception():
+            raise future.exception()
+        return time.monotonic() - enqueued
+
+    def _release(self, service_time: float):
+        self._in_flight -= 1
+        self._service_times.append(service_time)
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, route: str, patient: str = ""):
+        """Hold an LLM slot for the duration of the block."""
+        waited = await self._acquire(route, patient or "")
+        self._waits.setdefault(route, deque(maxlen=1000)).append(waited)
+        self._counters[f"admitted_{route}"] += 1
+
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._release(time.monotonic() - start)
+
+    # ------------------------------- #
+    def metrics(self) -> dict:
+        """Queue depth, in-flight count, wait-time percentiles and counters."""
+        def percentiles(samples):
+            if not samples:
+                return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+            ordered = sorted(samples)
+
+            def pick(q):
+                return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+            return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)}
+
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self._waiting,
+            "max_queue": self.max_queue,
+            "queue_depth_by_route": {r: self._queued_by_route[r] for r in PRIORITIES},
+            "queue_wait": {route: percentiles(samples) for route, samples in self._waits.items()},
+            "avg_service_ms": round(sum(self._service_times) / len(self._service_times) * 1000, 1)
+            if self._service_times else None,
+            "counters": dict(self._counters),
+        }
@@ -0,0 +1,231 @@
+# backend/utils/bulk_io.py
+
+import argparse
+import json
+import sys
+import os
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.patient_db import append_patient_records, iter_patient_records
+from backend.utils.logger import log_event
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Only the first rejects are kept in the report so memory stays flat on bad feeds
+MAX_REPORTED_REJECTS = 1000
+
+# Longest accepted NDJSON line; longer lines are rejected without being buffered
+MAX_LINE_BYTES = 1024 * 1024
+
+# -------------------------
+# Record Schema
+# -------------------------
+REQUIRED_FIELDS = {
+    "patient_name": str,
+    "discharge_date": str,
+    "primary_diagnosis": str,
+}
+
+OPTIONAL_FIELDS = {
+    "medications": list,
+    "dietary_restrictions": str,
+    "follow_up": str,
+    "warning_signs": str,
+    "discharge_instructions": str,
+    "created_at": str,
+}
+
+
+def validate_record(record) -> list:
+    """Return a list of schema errors for a discharge record (empty if valid)."""
+    if not isinstance(record, dict):
+        return ["record must be a JSON object"]
+
+    errors = []
+    for field, expected in REQUIRED_FIELDS.items():
+        value = record.get(field)
+        if not isinstance(value, expected) or not str(value).strip():
+            errors.append(f"'{field}' is required and must be a non-empty {expected.__name__}")
+
+    for field, expected in OPTIONAL_FIELDS.items():
+        if field in record and not isinstance(record[field], expected):
+            errors.append(f"'{field}' must be a {expected.__name__}")
+
+    if isinstance(record.get("medications"), list) and not all(isinstance(m, str) for m in record["medications"]):
+        errors.append("'medications' must be a list of strings")
+
+    if isinstance(record.get("discharge_date"), str):
+        try:
+            date.fromisoformat(record["discharge_date"])
+        except ValueError:
+            errors.append("'discharge_date' must be an ISO date (YYYY-MM-DD)")
+
+    return errors
+
+
+# -------------------------
+# Import
+# -------------------------
+class NDJSONImporter:
+    """
+    Incremental NDJSON importer.
+
+    Lines (or raw byte chunks, via feed_bytes) are fed incrementally; valid
+    records are buffered and committed to the patient DB every `batch_size`
+    records, so memory is bounded by one batch plus one line.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.batch = []
+        self.lineno = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = []
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._pending = b""
+        self._skipping = False
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({"line": self.lineno, "error": reason})
+
+    def feed(self, line):
+        """Validate one NDJSON line and buffer it for the current batch."""
+        self.lineno += 1
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                self._reject(f"invalid UTF-8 at byte {e.start}")
+                return
+        if not line.strip():
+            return
+
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._reject(f"invalid JSON: {e.msg}")
+            return
+
+        errors = validate_record(record)
+        if errors:
+            self._reject("; ".join(errors))
+            return
+
+        record.setdefault("created_at", datetime.now().isoformat())
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def feed_bytes(self, chunk: bytes):
+        """Feed an arbitrary slice of an NDJSON byte stream (e.g. one HTTP body chunk)."""
+        if self._skipping:
+            newline = chunk.find(b"\n")
+            if newline == -1:
+                return
+            chunk, self._skipping = chunk[newline + 1:], False
+
+        *lines, self._pending = (self._pending + chunk).split(b"\n")
+        for line in lines:
+            self.feed(line)
+
+        if len(self._pending) > MAX_LINE_BYTES:
+            # Drop the oversized line up to its newline instead of buffering it
+            self.lineno += 1
+            self._reject(f"line exceeds {MAX_LINE_BYTES} bytes")
+            self._pending, self._skipping = b"", True
+
+    def flush(self):
+        """Commit the buffered batch atomically."""
+        if not self.batch:
+            return
+        self.accepted += append_patient_records(self.batch)
+        self.batches += 1
+        self.batch = []
+
+    def finish(self) -> dict:
+        """Commit the last partial batch and return the import report."""
+        if self._pending and not self._skipping:
+            self.feed(self._pending)
+        self._pending = b""
+        self.flush()
+        elapsed = time.perf_counter() - self.started
+        summary = {
+            "lines": self.lineno,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "records_per_sec": round(self.accepted / elapsed, 1) if elapsed > 0 else None,
+            "rejects": self.rejects,
+        }
+        log_event("BulkImport", f"Imported {self.accepted} records ({self.rejected} rejected) in {summary['seconds']}s")
+        return summary
+
+
+def import_ndjson(lines, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Import an iterable of NDJSON lines (e.g. an open file) into the patient DB."""
+    importer = NDJSONImporter(batch_size)
+    for line in lines:
+        importer.feed(line)
+    return importer.finish()
+
+
+# -------------------------
+# Export
+# -------------------------
+def export_ndjson(batch_size: int = DEFAULT_BATCH_SIZE):
+    """Yield the patient DB as NDJSON text, `batch_size` records per chunk."""
+    buffer = []
+    for record in iter_patient_records():
+        buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(buffer) >= batch_size:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of discharge records as NDJSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Import an NDJSON file into the patient DB")
+    imp.add_argument("path", help="NDJSON file, or '-' for stdin")
+    imp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    exp = sub.add_parser("export", help="Export the patient DB as NDJSON")
+    exp.add_argument("path", help="Output file, or '-' for stdout")
+    exp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        # Read raw bytes so a line that is not valid UTF-8 is rejected, not fatal
+        src = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        importer = NDJSONImporter(args.batch_size)
+        with src:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                importer.feed_bytes(chunk)
+        summary = importer.finish()
+        print(json.dumps(summary, indent=2))
+        return 1 if summary["rejected"] else 0
+
+    dst = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8")
+    with dst:
+        for chunk in export_ndjson(args.batch_size):
+            dst.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
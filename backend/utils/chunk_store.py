@@ -0,0 +1,223 @@
+# backend/utils/chunk_store.py
+
+import json
+import mmap
+import os
+import re
+import struct
+import uuid
+import zlib
+from array import array
+from pathlib import Path
+
+# Store layout (one directory; <gen> is a random id per write):
+#   chunks.<gen>.bin       concatenated UTF-8 chunk texts
+#   chunks.<gen>.idx       header | offsets[count+1] u64 | source_ids[count] u32 | pages[count] u32
+#   provenance.<gen>.json  optional {chunk_id: [{"source", "page"}, ...]} of merged near-duplicates
+#   manifest.json          {"format", "count", "checksum", "blob_size", "sources", "files": {...}}
+# The manifest names the generation's files and is replaced last with one
+# os.replace, so rewriting a store in place is atomic for readers: they see
+# either the old generation or the new one, never a mix. Stores written before
+# generations existed use the fixed names below.
+BLOB_FILE = "chunks.bin"
+INDEX_FILE = "chunks.idx"
+MANIFEST_FILE = "manifest.json"
+PROVENANCE_FILE = "provenance.json"
+
+# Files owned by a store: generation files plus the pre-generation fixed names
+_STORE_FILE = re.compile(r"(chunks\.[0-9a-f]{12}\.(bin|idx)|provenance\.[0-9a-f]{12}\.json|"
+                         r"chunks\.bin|chunks\.idx|provenance\.json)")
+
+# A reader may lose the race against a writer deleting the generation it just read about
+OPEN_RETRIES = 3
+
+MAGIC = b"CHNK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQ")  # magic, version, count (16 bytes keeps arrays 8-aligned)
+
+
+class ChunkStoreWriter:
+    """Stream chunks to disk; only offsets and per-chunk ids are held in memory."""
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._gen = uuid.uuid4().hex[:12]
+        self._files = {"blob": f"chunks.{self._gen}.bin", "index": f"chunks.{self._gen}.idx"}
+        self._blob = open(self.store_dir / self._files["blob"], "wb")
+        self._offsets = array("Q", [0])
+        self._source_ids = array("I")
+        self._pages = array("I")
+        self._sources = {}
+        self._provenance = {}
+        self._checksum = 0
+
+    def add(self, text: str, source: str = "", page: int = 0):
+        data = text.encode("utf-8")
+        self._blob.write(data)
+        self._checksum = zlib.crc32(data, self._checksum)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._source_ids.append(self._sources.setdefault(source, len(self._sources)))
+        self._pages.append(page or 0)
+
+    def add_provenance(self, chunk_id: int, source: str, page: int):
+        """Record that a dropped near-duplicate of chunk `chunk_id` also appeared at source/page."""
+        self._provenance.setdefault(chunk_id, []).append({"source": source, "page": page or 0})
+
+    @property
+    def nbytes(self) -> int:
+        return self._offsets[-1]
+
+    def __len__(self):
+        return len(self._pages)
+
+    def close(self):
+        """Write this generation's index, then publish it with a single manifest replace."""
+        self._blob.flush()
+        os.fsync(self._blob.fileno())
+        self._blob.close()
+        count = len(self._pages)
+
+        with open(self.store_dir / self._files["index"], "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+            self._offsets.tofile(f)
+            self._source_ids.tofile(f)
+            self._pages.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self._provenance:
+            self._files["provenance"] = f"provenance.{self._gen}.json"
+            with open(self.store_dir / self._files["provenance"], "w", encoding="utf-8") as f:
+                json.dump({str(k): v for k, v in self._provenance.items()}, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        # The generation being replaced stays on disk until the next write, so a
+        # reader that just read the old manifest can still open its files
+        keep = set(self._files.values())
+        try:
+            with open(self.store_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+                keep.update(json.load(f).get("files", {}).values())
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        manifest = {"format": FORMAT_VERSION, "count": count, "checksum": self._checksum,
+                    "blob_size": self._offsets[-1], "sources": list(self._sources), "files": self._files}
+        with open(self.store_dir / (MANIFEST_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.store_dir / (MANIFEST_FILE + ".tmp"), self.store_dir / MANIFEST_FILE)
+        self._remove_files(keep)
+
+    def _remove_files(self, keep: set):
+        """Delete chunk files not in `keep` (older generations, or this one on abort)."""
+        for path in self.store_dir.iterdir():
+            if _STORE_FILE.fullmatch(path.name) and path.name not in keep:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass  # still mapped by a reader on Windows; removed by the next write
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._blob.close()
+            for name in self._files.values():
+                try:
+                    os.unlink(self.store_dir / name)
+                except OSError:
+                    pass
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped chunk store.
+
+    Behaves like a list of strings (len, indexing, iteration) but only decodes
+    the chunks that are actually accessed; pages are shared between processes
+    through the OS page cache.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        for attempt in range(OPEN_RETRIES):
+            try:
+                self._open()
+                break
+            except FileNotFoundError:
+                # The generation named by the manifest we read was just replaced
+                if attempt == OPEN_RETRIES - 1:
+                    raise
+
+    def _open(self):
+        with open(self.store_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        files = self.manifest.get("files", {})
+        self.sources = self.manifest["sources"]
+        self.checksum = self.manifest.get("checksum")
+
+        self._provenance = {}
+        provenance = files.get("provenance", PROVENANCE_FILE if "files" not in self.manifest else None)
+        if provenance and (self.store_dir / provenance).exists():
+            with open(self.store_dir / provenance, "r", encoding="utf-8") as f:
+                self._provenance = json.load(f)
+
+        self._idx = self._map(self.store_dir / files.get("index", INDEX_FILE))
+        magic, version, count = HEADER.unpack_from(self._idx, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store at {self.store_dir}")
+        if count != self.manifest["count"]:
+            raise ValueError(f"Chunk store at {self.store_dir} is inconsistent: "
+                             f"index has {count} chunks, manifest {self.manifest['count']}")
+        self.count = count
+
+        view = memoryview(self._idx)
+        pos = HEADER.size
+        self._offsets = view[pos:pos + 8 * (count + 1)].cast("Q")
+        pos += 8 * (count + 1)
+        self._source_ids = view[pos:pos + 4 * count].cast("I")
+        pos += 4 * count
+        self._pages = view[pos:pos + 4 * count].cast("I")
+
+        self._blob = self._map(self.store_dir / files.get("blob", BLOB_FILE))
+        if len(self._blob) != self._offsets[count]:
+            raise ValueError(f"Chunk store at {self.store_dir} is inconsistent: "
+                             f"blob is {len(self._blob)} bytes, index expects {self._offsets[count]}")
+
+    @staticmethod
+    def _map(path: Path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("chunk index out of range")
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def metadata(self, i: int) -> dict:
+        """Provenance of chunk i: source document and page, plus merged duplicates if any."""
+        meta = {"source": self.sources[self._source_ids[i]], "page": self._pages[i]}
+        if str(i) in self._provenance:
+            meta["duplicates"] = self._provenance[str(i)]
+        return meta
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._blob)
@@ -0,0 +1,107 @@
+# backend/utils/name_index.py
+
+import re
+import heapq
+import math
+import threading
+
+# Candidates below this Dice similarity are never returned
+MIN_SCORE = 0.35
+
+# Upper bound on names verified per query, keeps lookups sub-millisecond
+MAX_CANDIDATES = 1000
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, drop punctuation and sort tokens so 'Smith, John' == 'john smith'."""
+    tokens = re.findall(r"[a-z0-9]+", (name or "").lower())
+    return " ".join(sorted(tokens))
+
+
+def trigrams(key: str) -> frozenset:
+    """Padded character trigrams of each token of a normalized name."""
+    grams = set()
+    for token in key.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over patient names.
+
+    Each distinct normalized name is stored once with its trigram set; postings map
+    a trigram to the ids of the names containing it. Queries only scan the postings
+    of their rarest trigrams (prefix filtering), then verify candidates exactly, so
+    lookups stay cheap even when common trigrams like ' jo' hit thousands of names.
+    """
+
+    def __init__(self):
+        self._keys = []          # id -> normalized name
+        self._grams = []         # id -> trigram set
+        self._names = []         # id -> original spellings
+        self._ids = {}           # normalized name -> id
+        self._postings = {}      # trigram -> [id, ...]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name: str):
+        """Index one patient name (no-op if already present)."""
+        key = normalize_name(name)
+        if not key:
+            return
+        with self._lock:
+            idx = self._ids.get(key)
+            if idx is not None:
+                if name not in self._names[idx]:
+                    self._names[idx].append(name)
+                return
+
+            idx = len(self._keys)
+            grams = trigrams(key)
+            self._keys.append(key)
+            self._grams.append(grams)
+            self._names.append([name])
+            self._ids[key] = idx
+            for g in grams:
+                self._postings.setdefault(g, []).append(idx)
+
+    def search(self, name: str, limit: int = 5, min_score: float = MIN_SCORE) -> list:
+        """Return up to `limit` candidates as [{'patient_name', 'score'}], best first."""
+        key = normalize_name(name)
+        if not key:
+            return []
+
+        query = trigrams(key)
+        q = len(query)
+
+        # Dice >= t needs at least ceil(t*q / (2-t)) shared trigrams, so any match
+        # must hit one of the q - min_shared + 1 rarest query trigrams. Postings are
+        # merged rarest-first until MAX_CANDIDATES is reached; below that budget the
+        # result is exact, above it only very common names (e.g. 'mary') are cut.
+        min_shared = max(1, math.ceil(min_score * q / (2 - min_score)))
+        ranked = sorted(query, key=lambda g: len(self._postings.get(g, ())))
+        candidates = set()
+        for g in ranked[:q - min_shared + 1]:
+            postings = self._postings.get(g)
+            if not postings:
+                continue
+            if candidates and len(candidates) + len(postings) > MAX_CANDIDATES:
+                break
+            candidates.update(postings[:MAX_CANDIDATES])
+
+        scored = []
+        for idx in candidates:
+            grams = self._grams[idx]
+            score = 2 * len(query & grams) / (q + len(grams))
+            if score >= min_score:
+                scored.append((score, idx))
+
+        best = heapq.nlargest(limit, scored)
+        return [
+            {"patient_name": self._names[idx][0], "score": round(score, 3)}
+            for score, idx in best
+        ]
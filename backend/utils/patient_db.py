@@ -1,31 +1,144 @@
+import hashlib
 import json
+import os
+import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from backend.utils.logger import log_event
+from backend.utils.name_index import TrigramIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
 
 # Path to the patient database JSON file
 DB_PATH = Path(__file__).resolve().parent.parent / "data" / "patients.json"
 
+# Bytes read per step when streaming records out of the JSON array
+READ_CHUNK_SIZE = 64 * 1024
+
+# Serializes in-process writers so batch appends never interleave
+_DB_LOCK = threading.Lock()
+
+# Crash safety for in-place appends: before the array tail is overwritten, its
+# offset and original bytes go to <db>.journal (fsynced). The journal is removed
+# once the batch is durable, so a journal found later means the append was
+# interrupted and is rolled back. <db>.lock serializes writers across processes.
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# Fuzzy name index, built lazily on first lookup. It is tied to the DB file's
+# (size, mtime) at build time: this process's own appends keep it current, and
+# a write by any other process (bulk_io CLI, another uvicorn worker) changes the
+# signature, so the next lookup rebuilds it.
+_name_index = None
+_name_index_sig = None
+
+def _db_signature():
+    try:
+        st = os.stat(DB_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def _journal_path() -> Path:
+    return DB_PATH.with_name(DB_PATH.name + JOURNAL_SUFFIX)
+
+@contextmanager
+def _writer_lock():
+    """Exclusive across threads and processes; the OS drops the file lock if its holder dies."""
+    with _DB_LOCK:
+        if fcntl is None:
+            yield
+            return
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DB_PATH.with_name(DB_PATH.name + LOCK_SUFFIX), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _fsync_dir(path: Path):
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _rollback_journal() -> bool:
+    """Undo an interrupted batch append. Caller holds the writer lock."""
+    journal = _journal_path()
+    try:
+        with open(journal, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return False
+    except json.JSONDecodeError:
+        # Torn journal: the crash happened before the DB itself was touched
+        os.unlink(journal)
+        return False
+
+    with open(DB_PATH, "r+b") as f:
+        f.seek(entry["offset"])
+        f.write(entry["tail"].encode("utf-8"))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+    os.unlink(journal)
+    _fsync_dir(DB_PATH.parent)
+    log_event("PatientDB", f"⚠️ Rolled back an interrupted batch append at byte {entry['offset']}")
+    return True
+
+def recover_db():
+    """Roll back a batch append interrupted by a crash; a cheap no-op when there is none."""
+    if _journal_path().exists():
+        with _writer_lock():
+            _rollback_journal()
+
+def _write_db(data):
+    """Replace the whole DB atomically (temp file + rename). Caller holds the writer lock."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = DB_PATH.with_name(DB_PATH.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, DB_PATH)
+    _fsync_dir(DB_PATH.parent)
+
 def load_db():
     """Load the JSON database safely."""
+    recover_db()
     if not DB_PATH.exists():
-        log_event.warning(f"⚠️ No patient DB found at {DB_PATH}, creating a new one.")
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with open(DB_PATH, "w") as f:
-            json.dump([], f)
+        log_event("PatientDB", f"⚠️ No patient DB found at {DB_PATH}, creating a new one.")
+        save_db([])
         return []
 
-    with open(DB_PATH, "r") as f:
+    with open(DB_PATH, "r", encoding="utf-8") as f:
         try:
             return json.load(f)
         except json.JSONDecodeError:
-            log_event.error("❌ Corrupted patient database — resetting file.")
-            return []
+            pass
+
+    # Damaged file (e.g. truncated by hand or by a crash outside append_patient_records):
+    # serve every complete record instead of an empty DB, and leave the file for repair
+    records = list(iter_patient_records())
+    log_event("PatientDB", f"❌ Patient DB at {DB_PATH} is damaged — serving its {len(records)} complete records")
+    return records
 
 def save_db(data):
     """Save updated patient data."""
-    with open(DB_PATH, "w") as f:
-        json.dump(data, f, indent=4)
+    with _writer_lock():
+        _rollback_journal()
+        _write_db(data)
 
 def get_patient_data(name: str):
     """Retrieve patient data by name."""
@@ -33,20 +146,161 @@ def get_patient_data(name: str):
     matches = [p for p in db if p["patient_name"].lower() == name.lower()]
     
     if not matches:
-        log_event.info(f"No record found for {name}")
+        log_event("PatientDB", f"No record found for {name}")
         return None
     if len(matches) > 1:
-        log_event.warning(f"⚠️ Multiple records found for {name}, returning the latest.")
+        log_event("PatientDB", f"⚠️ Multiple records found for {name}, returning the latest.")
         matches = sorted(matches, key=lambda x: x.get("discharge_date", ""), reverse=True)
     
     log_event("PatientDB", f"✅ Retrieved record for {name}")
 
     return matches[0]
 
+def record_version(record: dict) -> str:
+    """Content hash of a record; changes whenever any field of the record changes."""
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=12).hexdigest()
+
+def get_name_index() -> TrigramIndex:
+    """Return the trigram index over patient names, (re)building it on first use or after outside writes."""
+    global _name_index, _name_index_sig
+    if _name_index is None or _db_signature() != _name_index_sig:
+        with _writer_lock():  # no appends can slip in between the scan and publishing
+            _rollback_journal()
+            signature = _db_signature()
+            if _name_index is None or signature != _name_index_sig:
+                index = TrigramIndex()
+                for record in _read_records():
+                    index.add(record.get("patient_name", ""))
+                _name_index, _name_index_sig = index, signature
+                log_event("PatientDB", f"Built name index over {len(index)} names")
+    return _name_index
+
+def find_patient_candidates(name: str, limit: int = 5) -> list:
+    """Ranked fuzzy matches for a patient name, e.g. 'smith, jon' -> 'John Smith'."""
+    return get_name_index().search(name, limit)
+
+def iter_patient_records(chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Stream records one at a time from the JSON array without loading the whole DB.
+    A damaged or unterminated array ends the stream after its last complete record.
+    """
+    recover_db()
+    yield from _read_records(chunk_size)
+
+def _read_records(chunk_size: int = READ_CHUNK_SIZE):
+    if not DB_PATH.exists():
+        return
+
+    decoder = json.JSONDecoder()
+    with open(DB_PATH, "r", encoding="utf-8") as f:
+        buf, pos, started = "", 0, False
+        while True:
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+
+            if not started:
+                stripped = buf.lstrip()
+                if not stripped:
+                    if not chunk:
+                        return
+                    continue
+                if stripped[0] != "[":
+                    raise json.JSONDecodeError("Patient DB must be a JSON array", stripped, 0)
+                buf, started = stripped[1:], True
+
+            while True:
+                pos = _SEPARATORS.match(buf, pos).end()
+                if buf.startswith("]", pos):
+                    return
+                try:
+                    record, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    break  # record spans the next chunk
+                yield record
+                pos = end
+
+            if not chunk:
+                log_event("PatientDB", f"⚠️ Patient DB at {DB_PATH} ends after an incomplete record")
+                return
+
+
+def _find_array_tail(f, size: int):
+    """Return (offset of the closing ']', whether the array is empty)."""
+    window = 4096
+    while True:
+        start = max(0, size - window)
+        f.seek(start)
+        block = f.read(size - start)
+        close = block.rstrip().rfind(b"]")
+        if close != -1:
+            before = block[:close].rstrip()
+            if before or start == 0:
+                return start + close, before.endswith(b"[")
+        if start == 0:
+            raise ValueError(f"Patient DB at {DB_PATH} is not a JSON array")
+        window *= 2
+
+
+def append_patient_records(records: list):
+    """
+    Append a batch of records to the end of the JSON array in place.
+
+    Only the batch is serialized and written, so the cost is independent of the DB size.
+    The batch is all-or-nothing, including across crashes: the original tail is
+    journaled first and restored by recover_db if the write never completed.
+    """
+    if not records:
+        return 0
+
+    payload = ",\n".join("  " + json.dumps(r, ensure_ascii=False) for r in records)
+
+    global _name_index_sig
+    with _writer_lock():
+        _rollback_journal()
+        if not DB_PATH.exists():
+            _write_db([])
+        # Only patch the index in place if it already reflects every earlier write
+        index_current = _name_index is not None and _db_signature() == _name_index_sig
+
+        with open(DB_PATH, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            close, empty = _find_array_tail(f, size)
+            f.seek(close)
+            original_tail = f.read()
+
+            with open(_journal_path(), "w", encoding="utf-8") as journal:
+                json.dump({"offset": close, "tail": original_tail.decode("utf-8")}, journal)
+                journal.flush()
+                os.fsync(journal.fileno())
+            _fsync_dir(DB_PATH.parent)
+
+            try:
+                f.seek(close)
+                f.write((("\n" if empty else ",\n") + payload + "\n]\n").encode("utf-8"))
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception:
+                f.close()
+                _rollback_journal()
+                raise
+
+        # Commit point: once the journal is gone the batch is permanent
+        os.unlink(_journal_path())
+        _fsync_dir(DB_PATH.parent)
+
+        if index_current:
+            for r in records:
+                _name_index.add(r.get("patient_name", ""))
+            _name_index_sig = _db_signature()
+
+    return len(records)
+
+
 def add_patient_record(record: dict):
     """Add a new patient record."""
-    db = load_db()
     record["created_at"] = datetime.now().isoformat()
-    db.append(record)
-    save_db(db)
-    log_event.info(f"🩺 Added record for {record['patient_name']}")
+    append_patient_records([record])
+    log_event("PatientDB", f"🩺 Added record for {record['patient_name']}")
@@ -1,11 +1,17 @@
 # backend/utils/pdf_parser.py
 
 import fitz  # PyMuPDF
+import os
 import re
+import sys
 from tqdm import tqdm
-import json
 from pathlib import Path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.chunk_store import ChunkStoreWriter
+from backend.utils.dedup import NearDuplicateFilter, dedup_stats
+
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract raw text from PDF using PyMuPDF"""
     doc = fitz.open(pdf_path)
@@ -16,6 +22,18 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     return text
 
 
+def iter_pages_from_pdf(pdf_path: str):
+    """Yield (page_number, text) pairs one page at a time so chunks can keep their page provenance"""
+    with fitz.open(pdf_path) as doc:
+        for i, page in enumerate(tqdm(doc, desc="Extracting PDF text")):
+            yield i + 1, page.get_text("text")
+
+
+def extract_pages_from_pdf(pdf_path: str) -> list:
+    """Extract all (page_number, text) pairs of a PDF"""
+    return list(iter_pages_from_pdf(pdf_path))
+
+
 def clean_text(text: str) -> str:
     """Basic cleanup to remove multiple spaces, headers, etc."""
     text = re.sub(r'\n+', '\n', text)               # normalize newlines
@@ -24,45 +42,101 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100):
-    """Split text into overlapping chunks for embeddings"""
-    sentences = re.split(r'(?<=[.!?]) +', text)
-    chunks, current_chunk = [], ""
+def _with_overlap(previous, text: str, overlap: int) -> str:
+    """Prefix a chunk with the last ~`overlap` chars (whole words) of the previous one"""
+    if previous is None or overlap <= 0:
+        return text
+    tail = previous[-overlap:].split(" ", 1)[-1] if len(previous) > overlap else previous
+    return f"{tail} {text}".strip()
+
+
+def _pack_sentences(tagged_sentences, chunk_size: int, overlap: int):
+    """
+    Greedily pack (sentence, page) pairs into chunks, yielding each one as soon as
+    it is full, so only the current and previous chunk are held; a chunk keeps its first page
+    """
+    previous, current_chunk, current_page = None, "", None
 
-    for sentence in sentences:
+    for sentence, page in tagged_sentences:
         if len(current_chunk) + len(sentence) < chunk_size:
             current_chunk += " " + sentence
+            if current_page is None:
+                current_page = page
         else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence
+            text = current_chunk.strip()
+            yield _with_overlap(previous, text, overlap), current_page
+            previous, current_chunk, current_page = text, sentence, page
 
     if current_chunk:
-        chunks.append(current_chunk.strip())
+        yield _with_overlap(previous, current_chunk.strip(), overlap), current_page
 
-    # Add overlap
-    final_chunks = []
-    for i in range(0, len(chunks)):
-        start = max(0, i - 1)
-        merged = " ".join(chunks[start:i+1])
-        final_chunks.append(merged)
 
-    return final_chunks
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100):
+    """Split text into overlapping chunks for embeddings"""
+    sentences = re.split(r'(?<=[.!?]) +', text)
+    return [chunk for chunk, _ in _pack_sentences(((s, None) for s in sentences), chunk_size, overlap)]
+
+
+def chunk_pages(pages, chunk_size: int = 800, overlap: int = 100):
+    """Chunk per-page text lazily, yielding (chunk, page_number) pairs"""
+    tagged = (
+        (sentence, page_no)
+        for page_no, text in pages
+        for sentence in re.split(r'(?<=[.!?]) +', clean_text(text))
+    )
+    return _pack_sentences(tagged, chunk_size, overlap)
+
+
+def ingest_pdf(store: ChunkStoreWriter, pdf_path: str, dedup: NearDuplicateFilter = None):
+    """
+    Stream one PDF, page by page, into `store`. Near-duplicates of already stored
+    chunks are not stored again; their source/page is recorded on the chunk they
+    duplicate. Returns (chunks kept, chunks seen, bytes seen).
+    """
+    source = Path(pdf_path).name
+    kept = seen = seen_bytes = 0
+
+    for chunk, page in chunk_pages(iter_pages_from_pdf(pdf_path)):
+        if not chunk:
+            continue  # page without extractable text (e.g. a scanned image)
+        seen += 1
+        seen_bytes += len(chunk.encode("utf-8"))
+        duplicate_of = dedup.add(chunk) if dedup else None
+        if duplicate_of is None:
+            store.add(chunk, source=source, page=page)
+            kept += 1
+        else:
+            store.add_provenance(duplicate_of, source, page)
 
+    return kept, seen, seen_bytes
 
-def process_pdf(pdf_path: str, output_path: str):
-    """Extract, clean, chunk, and save PDF text"""
-    raw_text = extract_text_from_pdf(pdf_path)
-    clean = clean_text(raw_text)
-    chunks = chunk_text(clean)
 
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(chunks, f, indent=2, ensure_ascii=False)
+def process_pdfs(pdf_paths, output_dir: str, dedup_threshold: float = 0.8):
+    """Extract, clean, chunk and de-duplicate PDFs page by page into a memory-mappable chunk store"""
+    dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+    seen = seen_bytes = 0
 
-    print(f"✅ Processed {len(chunks)} chunks saved to {output_path}")
+    with ChunkStoreWriter(output_dir) as store:
+        for pdf_path in pdf_paths:
+            _, n, nbytes = ingest_pdf(store, pdf_path, dedup)
+            seen += n
+            seen_bytes += nbytes
+        stats = dedup_stats(seen, len(store), seen_bytes, store.nbytes)
+
+    print(f"✅ Processed {stats['chunks_after']} chunks saved to {output_dir} "
+          f"({stats['chunks_removed']} near-duplicates removed, "
+          f"text {stats['text_bytes_before']:,} -> {stats['text_bytes_after']:,} bytes, "
+          f"index ~{stats['index_bytes_before']:,} -> {stats['index_bytes_after']:,} bytes, "
+          f"search cost x{stats['search_cost_ratio']})")
+    return stats
+
+
+def process_pdf(pdf_path: str, output_path: str):
+    """Extract, clean, chunk, and save PDF text"""
+    return process_pdfs([pdf_path], output_path)
 
 
 if __name__ == "__main__":
     pdf_path = "E:\\assi\\backend\data\comprehensive-clinical-nephrology.pdf"
-    output_path = "backend/data/chunks/nephrology_chunks.json"
+    output_path = "backend/data/chunks/nephrology_store"
     process_pdf(pdf_path, output_path)
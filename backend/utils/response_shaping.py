@@ -0,0 +1,72 @@
+# backend/utils/response_shaping.py
+
+import hashlib
+import importlib.util
+import os
+
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel
+
+# Bodies below this size go out uncompressed; the framing overhead would eat the saving
+COMPRESS_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESS_MIN_SIZE", "500"))
+
+HAS_BROTLI = importlib.util.find_spec("brotli_asgi") is not None
+
+
+class ChatReply(BaseModel):
+    """
+    /chat response body. With a response model FastAPI serializes straight to JSON
+    bytes in Pydantic's core instead of jsonable_encoder + json.dumps; routes use
+    response_model_exclude_unset so fields a reply does not set are left out.
+    """
+    role: str
+    response: str
+    patient: dict | None = None
+    candidates: list[dict] | None = None
+
+
+def add_compression(app, minimum_size: int = COMPRESS_MIN_SIZE) -> str:
+    """Compress large responses: br (with gzip fallback) if brotli-asgi is installed, else gzip."""
+    if HAS_BROTLI:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=minimum_size, gzip_fallback=True)
+        return "br, gzip"
+    app.add_middleware(GZipMiddleware, minimum_size=minimum_size)
+    return "gzip"
+
+
+def parse_fields(fields: str | None):
+    """'a, b' -> ('a', 'b'); None or '*' means the whole record."""
+    if fields is None or fields.strip() == "*":
+        return None
+    return tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+
+
+def select_fields(record: dict, fields: str | None) -> dict:
+    """Project a record onto the requested fields; unknown fields are ignored."""
+    wanted = parse_fields(fields)
+    if wanted is None:
+        return record
+    return {key: record[key] for key in wanted if key in record}
+
+
+def make_etag(version: str, fields: str | None = None) -> str:
+    """
+    Weak ETag for a record version and field selection. Weak because the same
+    representation may be sent identity-, gzip- or br-encoded.
+    """
+    wanted = parse_fields(fields)
+    if wanted is not None:
+        selection = ",".join(sorted(wanted)).encode("utf-8")
+        version = f"{version}-{hashlib.blake2b(selection, digest_size=4).hexdigest()}"
+    return f'W/"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check using weak comparison (RFC 9110, 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
@@ -1,5 +1,6 @@
 from ddgs import DDGS
 import re
+from backend.tools.llm_tool import record_failure
 
 def perform_web_search(query: str, num_results: int = 5, language: str = "en"):
     """
@@ -53,4 +54,5 @@ def perform_web_search(query: str, num_results: int = 5, language: str = "en"):
         return context_string
 
     except Exception as e:
+        record_failure(f"Web search error: {e}")
         return f"⚠️ Error fetching web data: {e}"